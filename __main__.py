@@ -1,10 +1,16 @@
 #!/usr/bin/env python3
 """The main entry point to the translator"""
 from argparse import ArgumentParser
+import os
 from pathlib import Path
 import sys
 
 from pythonlua.config import Config
+from pythonlua.luatarget import LuaTarget
+from pythonlua.projecttranslator import ProjectTranslator
+from pythonlua.runtimebuilder import RuntimeBuilder
+from pythonlua.sourcemap import SourceMap
+from pythonlua.translationcache import TranslationCache
 from pythonlua.translator import Translator
 
 
@@ -12,7 +18,9 @@ def create_arg_parser():
     """Create and initialize an argument parser object"""
     parser = ArgumentParser(description="Python to lua translator.")
     parser.add_argument("inputfilename", metavar="IF", type=str,
-                        help="A python script filename to translate it.",
+                        help="A python script filename to translate it. "
+                             "A directory or a glob pattern translates all "
+                             "python files into the output directory.",
                         nargs="?", default="")
     parser.add_argument("configfilename", metavar="CONFIG", type=str,
                         help="Translator configuration file in yaml format.",
@@ -20,21 +28,126 @@ def create_arg_parser():
 
     parser.add_argument("--show-ast", help="Print python ast tree before code.",
                         dest="show_ast", action="store_true")
+    parser.add_argument("--profile", help="Print time and emitted bytes of every visit method and the hits "
+                                           "of --cache-dir to stderr.",
+                        dest="profile", action="store_true")
     parser.add_argument("--only-lua-init", help="Print only lua initialization code.",
                         dest="only_lua_init", action="store_true")
     parser.add_argument("--no-lua-init", help="Print lua code without lua init code.",
                         dest="no_lua_init", action="store_true")
+    parser.add_argument("--minimal-lua-init", help="Print only the lua init code used by the translated code.",
+                        dest="minimal_lua_init", action="store_true")
+    parser.add_argument("--runtime-module", help="Require the lua init code as a lua module instead of inlining it, "
+                                                 "the project mode requires the 'luainit' module by default.",
+                        dest="runtime_module", type=str, default=None)
+    parser.add_argument("--precompile-runtime", help="Compile the runtime module of the project mode to bytecode.",
+                        dest="precompile_runtime", action="store_true")
+    parser.add_argument("--luac", help="Lua compiler used to precompile the runtime.",
+                        dest="luac", type=str, default="luac")
+    parser.add_argument("--target", help="Lua version of the generated code: {}. "
+                                         "Overrides the target of the config.".format(
+                                             ", ".join(LuaTarget.TARGETS)),
+                        dest="target", type=str, choices=list(LuaTarget.TARGETS),
+                        default=None)
+    parser.add_argument("--lua-profile", help="Install the sampling profiler of the lua runtime, "
+                                              "the collapsed stacks are written at exit.",
+                        dest="lua_profile", action="store_true")
+    parser.add_argument("--lua-allocations", help="Use the lua runtime counting the allocations of "
+                                                  "containers and instances, the report is written at exit.",
+                        dest="lua_allocations", action="store_true")
+    parser.add_argument("--source-map", help="Write the python line of every lua line into "
+                                             "the .lua.map file of the translated file.",
+                        dest="source_map", action="store_true")
+    parser.add_argument("--cache-dir", help="Cache translated code in the directory.",
+                        dest="cache_dir", type=str, default=None)
+    parser.add_argument("-o", "--output-dir", help="Output directory for the project mode.",
+                        dest="output_dir", type=str, default=None)
+    parser.add_argument("-j", "--jobs", help="Number of worker processes for the project mode.",
+                        dest="jobs", type=int, default=None)
+    parser.add_argument("--force", help="Translate files even if the output is newer.",
+                        dest="force", action="store_true")
 
     return parser
 
 
+def load_config(argv):
+    """Load the translator config and apply the command line options"""
+    config = Config(argv.configfilename)
+    if argv.target is not None:
+        config.data["target"] = argv.target
+    return config
+
+
+def translate_project(argv):
+    """Translate all python files of the directory or the glob pattern"""
+    if argv.output_dir is None:
+        raise RuntimeError("The output directory is required to translate a project.")
+    if argv.profile:
+        raise RuntimeError("Profiling is supported only for a single file.")
+
+    project = ProjectTranslator(load_config(argv),
+                                argv.output_dir,
+                                jobs=argv.jobs,
+                                cache_dir=argv.cache_dir,
+                                force=argv.force,
+                                lua_init=not argv.no_lua_init,
+                                minimal_lua_init=argv.minimal_lua_init,
+                                runtime_module=argv.runtime_module,
+                                precompile=argv.precompile_runtime,
+                                luac=argv.luac,
+                                source_maps=argv.source_map,
+                                lua_profile=argv.lua_profile,
+                                lua_allocations=argv.lua_allocations)
+    failed = project.translate(argv.inputfilename)
+    return 1 if failed else 0
+
+
+def write_source_map(input_filename, translator, prologue):
+    """Write the source map of the translated file printed after the prologue"""
+    lua_filename = os.path.splitext(input_filename)[0] + ".lua"
+    source_map = SourceMap(input_filename, os.path.basename(lua_filename),
+                           translator.positions, translator.functions)
+    source_map.shift(sum((chunk + "\n").count("\n") for chunk in prologue))
+    source_map.save(SourceMap.get_filename(lua_filename))
+
+
 def main():
     """Entry point function to the translator"""
     parser = create_arg_parser()
     argv = parser.parse_args()
 
+    if ProjectTranslator.is_project(argv.inputfilename):
+        return translate_project(argv)
+
+    # A single translated file is printed, there is no runtime module file.
+    if argv.precompile_runtime:
+        parser.error("--precompile-runtime is supported only in the project mode")
+
+    # Chunks of lua code printed before the translated code.
+    prologue = []
+    if argv.lua_profile and not argv.show_ast and not argv.only_lua_init:
+        prologue.append(Translator.get_lua_profiler())
+
     if not argv.no_lua_init and not argv.show_ast:
-        print(Translator.get_luainit())
+        if argv.only_lua_init:
+            print(Translator.get_luainit())
+        elif argv.runtime_module is not None:
+            prologue.append(ProjectTranslator.make_require(argv.runtime_module))
+        elif not argv.minimal_lua_init:
+            prologue.append(Translator.get_luainit())
+
+    # The allocations are tracked by wrapping the constructors of the runtime.
+    allocations = None
+    if argv.lua_allocations and not argv.show_ast and not argv.only_lua_init:
+        allocations = Translator.get_lua_allocations()
+
+    minimal_lua_init = argv.minimal_lua_init and not argv.no_lua_init and \
+        argv.runtime_module is None
+    if allocations is not None and not minimal_lua_init:
+        prologue.append(allocations)
+
+    for chunk in prologue:
+        print(chunk)
 
     if argv.only_lua_init:
         return 0
@@ -51,12 +164,35 @@ def main():
     if not content:
         raise RuntimeError("The input file is empty.")
 
-    translator = Translator(Config(argv.configfilename),
-                            show_ast=argv.show_ast)
-    lua_code = translator.translate(content)
+    cache = None
+    if argv.cache_dir is not None:
+        cache = TranslationCache(argv.cache_dir)
 
-    if not argv.only_lua_init and not argv.show_ast:
+    translator = Translator(load_config(argv),
+                            show_ast=argv.show_ast, cache=cache,
+                            profile=argv.profile, source_map=argv.source_map)
+    if argv.show_ast:
+        translator.translate(content)
+        return 0
+
+    if minimal_lua_init:
+        lua_code = translator.translate(content)
+        runtime = [RuntimeBuilder().build(lua_code)]
+        if allocations is not None:
+            runtime.append(allocations)
+        for chunk in runtime:
+            print(chunk)
         print(lua_code)
+        prologue.extend(runtime)
+    else:
+        translator.translate_to_stream(content, sys.stdout)
+        print()
+
+    if argv.profile and cache is not None:
+        print("cache: {} hits, {} misses".format(cache.hits, cache.misses), file=sys.stderr)
+
+    if argv.source_map:
+        write_source_map(input_filename, translator, prologue)
     return 0
 
 
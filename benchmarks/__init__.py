@@ -0,0 +1 @@
+"""Translator benchmarks"""
@@ -0,0 +1,80 @@
+"""Synthetic python module generators for the benchmarks"""
+
+
+def wide_module(functions=500, statements=20):
+    """Module with many small top-level functions"""
+    lines = []
+    for i in range(functions):
+        lines.append("def function_{}(a, b=1):".format(i))
+        for j in range(statements):
+            lines.append("    a = a + {} * (b - {}) // 3".format(j, j))
+        lines.append("    return a")
+        lines.append("print(function_{}({}))".format(i, i))
+    return "\n".join(lines)
+
+
+def deep_module(functions=100, depth=12, statements=10):
+    """Module with deeply nested blocks inside functions"""
+    lines = []
+    for i in range(functions):
+        lines.append("def function_{}(a):".format(i))
+        indent = " " * 4
+        for level in range(depth):
+            lines.append("{}if a > {}:".format(indent, level))
+            indent += " " * 4
+        for j in range(statements):
+            lines.append("{}a = a + {} * (a - {})".format(indent, j, j))
+        lines.append("{}return a".format(indent))
+    return "\n".join(lines)
+
+
+def literal_module(literals=50, items=500):
+    """Module with big list and dict literals"""
+    lines = []
+    for i in range(literals):
+        values = ", ".join(str(j * i) for j in range(items))
+        lines.append("values_{} = [{}]".format(i, values))
+        pairs = ", ".join("\"key_{}\": {}".format(j, j) for j in range(items))
+        lines.append("table_{} = {{{}}}".format(i, pairs))
+    return "\n".join(lines)
+
+
+def class_module(classes=200, methods=10, statements=5):
+    """Module with many classes with methods"""
+    lines = []
+    for i in range(classes):
+        base = "(Class_{})".format(i - 1) if i else ""
+        lines.append("class Class_{}{}:".format(i, base))
+        lines.append("    counter = {}".format(i))
+        lines.append("    def __init__(self, value):")
+        lines.append("        self.value = value")
+        for j in range(methods):
+            lines.append("    def method_{}(self, a):".format(j))
+            for k in range(statements):
+                lines.append("        a = self.value + a * {}".format(k))
+            lines.append("        return a")
+        lines.append("instance_{} = Class_{}({})".format(i, i, i))
+    return "\n".join(lines)
+
+
+def comprehension_module(functions=200, comprehensions=10):
+    """Module with functions full of nested comprehensions"""
+    lines = []
+    for i in range(functions):
+        lines.append("def function_{}(items):".format(i))
+        for j in range(comprehensions):
+            lines.append("    a_{} = [x * y + {} for x in items for y in items "
+                         "if x != y]".format(j, j))
+            lines.append("    b_{} = {{x: [y for y in range(x) if y % 2]"
+                         " for x in a_{}}}".format(j, j))
+        lines.append("    return a_0, b_0")
+    return "\n".join(lines)
+
+
+MODULES = {
+    "wide": lambda scale: wide_module(functions=500 * scale),
+    "deep": lambda scale: deep_module(functions=100 * scale),
+    "literals": lambda scale: literal_module(literals=50 * scale),
+    "classes": lambda scale: class_module(classes=200 * scale),
+    "comprehensions": lambda scale: comprehension_module(functions=200 * scale),
+}
@@ -0,0 +1,98 @@
+--[[
+    Garbage produced by method calls of the class runtime compared with
+    the previous implementation creating a closure on every method access.
+
+    Run from the repository root: lua benchmarks/runtime/classes.lua
+--]]
+
+local LUAINIT = arg and arg[1] or "pythonlua/luainit.lua"
+local CALLS = 200000
+
+dofile(LUAINIT)
+
+-- The previous implementation.
+local old_class
+
+old_class = function(class_init, bases)
+    bases = bases or {}
+    local c = {}
+    
+    for _, base in ipairs(bases) do
+        for k, v in pairs(base) do
+            c[k] = v
+        end
+    end
+    c._bases = bases
+    
+    c = class_init(c)
+    
+    local mt = getmetatable(c) or {}
+    mt.__call = function(_, ...)
+        local object = {}
+        
+        setmetatable(object, {
+            __index = function(tbl, idx)
+                local method = c[idx]
+                if type(method) == "function" then
+                    return function(...)
+                        return c[idx](object, ...) 
+                    end
+                end
+                
+                return method
+            end,
+        })
+    
+        if type(object.__init__) == "function" then
+            object.__init__(...)
+        end
+        
+        return object
+    end
+    
+    setmetatable(c, mt)
+    
+    return c
+end
+
+local function make_counter(class_type)
+    return class_type(function(Counter)
+        function Counter.__init__(self)
+            self.value = 0
+        end
+        function Counter.increment(self)
+            self.value = self.value + 1
+        end
+        return Counter
+    end, {})
+end
+
+local function measure(name, call)
+    collectgarbage("collect")
+    collectgarbage("stop")
+    local before = collectgarbage("count")
+    local start = os.clock()
+
+    for _ = 1, CALLS do
+        call()
+    end
+
+    local elapsed = os.clock() - start
+    local after = collectgarbage("count")
+    collectgarbage("restart")
+
+    print(string.format("%-32s %10.1f bytes/call %10.2f ms",
+                        name, (after - before) * 1024 / CALLS, elapsed * 1000))
+end
+
+local OldCounter = make_counter(old_class)
+local NewCounter = make_counter(class)
+
+local old_object = OldCounter()
+measure("old object.increment()", function() old_object.increment() end)
+
+local new_object = NewCounter()
+measure("new object.increment()", function() new_object.increment() end)
+measure("new object.__class__.increment()", function()
+    new_object.__class__.increment(new_object)
+end)
@@ -0,0 +1,64 @@
+--[[
+    List comprehensions evaluated by an immediately called closure with
+    list.append compared with the inlined statements which store the
+    elements into a plain table by a counter.
+
+    Run from the repository root: lua benchmarks/runtime/comprehensions.lua
+--]]
+
+local LUAINIT = arg and arg[1] or "pythonlua/luainit.lua"
+local SIZE = 20
+local REPEAT = 50000
+
+dofile(LUAINIT)
+
+local function measure(name, work)
+    collectgarbage("collect")
+    local start = os.clock()
+    local result = work()
+    print(string.format("%-28s %10.2f ms", name, (os.clock() - start) * 1000))
+    return result
+end
+
+local items = list {}
+for i = 1, SIZE do
+    items.append(i)
+end
+
+local closure_total = measure("closure", function()
+    local total = 0
+    for _ = 1, REPEAT do
+        local squares = (function()
+            local result = list {}
+            for _, x in iterate(items) do
+                if x % 2 == 0 then
+                    result.append(x * x)
+                end
+            end
+            return result
+        end)()
+        total = total + len(squares)
+    end
+    return total
+end)
+
+local inline_total = measure("inline", function()
+    local total = 0
+    for _ = 1, REPEAT do
+        local squares
+        do
+            local result, size = {}, 0
+            for _, x in iterate(items) do
+                if x % 2 == 0 then
+                    size = size + 1
+                    result[size] = x * x
+                end
+            end
+            squares = list_of(result)
+        end
+        total = total + len(squares)
+    end
+    return total
+end)
+
+assert(closure_total == inline_total)
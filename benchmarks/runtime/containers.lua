@@ -0,0 +1,311 @@
+--[[
+    Memory and time of the list and dict runtime compared with
+    the previous closure-based constructors.
+
+    Run from the repository root: lua benchmarks/runtime/containers.lua
+--]]
+
+local LUAINIT = arg and arg[1] or "pythonlua/luainit.lua"
+local COUNT = 20000
+
+dofile(LUAINIT)
+
+-- The previous implementation, every instance carries its own methods.
+local old_list
+local old_dict
+
+old_list = {}
+setmetatable(old_list, {
+    __call = function(_, t)
+        local result = {}
+
+        result._is_list = true
+
+        result._data = {}
+        for _, v in ipairs(t) do
+            table.insert(result._data, v)
+        end
+    
+        local methods = {}
+
+        methods.append = function(value)
+            table.insert(result._data, value)
+        end
+
+        methods.extend = function(iterable)
+            for value in iterable do
+                table.insert(result._data, value)
+            end
+        end
+
+        methods.insert = function(index, value)
+            table.insert(result._data, index, value)
+        end
+
+        methods.remove = function(value)
+            for i, v in ipairs(result._data) do
+                if value == v then
+                    table.remove(result._data, i)
+                    break
+                end
+            end
+        end
+
+        methods.pop = function(index)
+            index = index or #result._data
+            local value = result._data[index]
+            table.remove(result._data, index)
+            return value
+        end
+
+        methods.clear = function()
+            result._data = {}
+        end
+
+        methods.index = function(value, start, end_)
+            start = start or 1
+            end_ = end_ or #result._data
+
+            for i = start, end_, 1 do
+                if result._data[i] == value then
+                    return i
+                end
+            end
+
+            return nil
+        end
+
+        methods.count = function(value)
+            local cnt = 0
+            for _, v in ipairs(result._data) do
+                if v == value then
+                    cnt = cnt + 1
+                end
+            end
+
+            return cnt
+        end
+
+        methods.sort = function(key, reverse)
+            key = key or nil
+            reverse = reverse or false
+
+            table.sort(result._data, function(a, b)
+                if reverse then
+                    return a < b
+                end
+
+                return a > b
+            end)
+        end
+
+        methods.reverse = function()
+            local new_data = {}
+            for i = #result._data, 1, -1 do
+                table.insert(new_data, result._data[i])
+            end
+
+            result._data = new_data
+        end
+
+        methods.copy = function()
+            return old_list(result._data)
+        end
+
+        local iterator_index = nil
+
+        setmetatable(result, {
+            __index = function(self, index)
+                if type(index) == "number" then
+                    if index < 0 then
+                        index = #result._data + index
+                    end
+                    return rawget(result._data, index + 1)
+                end
+
+                return methods[index]
+            end,
+            __newindex = function(self, index, value)
+                result._data[index] = value
+            end,
+            __call = function(self, _, idx)
+                if idx == nil and iterator_index ~= nil then
+                    iterator_index = nil
+                end
+
+                local v = nil
+                iterator_index, v = next(result._data, iterator_index)
+
+                return v
+            end,
+        })
+
+        return result
+    end,
+})
+
+old_dict = {}
+setmetatable(old_dict, {
+    __call = function(_, t)
+        local result = {}
+
+        result._is_dict = true
+
+        result._data = {}
+        for k, v in pairs(t) do
+            result._data[k] = v
+        end
+
+        local methods = {}
+
+        local key_index = nil
+
+        methods.clear = function()
+            result._data = {}
+        end
+
+        methods.copy = function()
+            return old_dict(result._data)
+        end
+
+        methods.get = function(key, default)
+            default = default or nil
+            if result._data[key] == nil then
+                return default
+            end
+
+            return result._data[key]
+        end
+
+        methods.items = function()
+            return pairs(result._data)
+        end
+
+        methods.keys = function()
+            return function(self, idx, _) 
+                if idx == nil and key_index ~= nil then
+                    key_index = nil
+                end
+
+                key_index, _ = next(result._data, key_index)
+                return key_index
+            end
+        end
+
+        methods.pop = function(key, default)
+            default = default or nil
+            if result._data[key] ~= nil then
+                local value = result._data[key]
+                result._data[key] = nil 
+                return key, value
+            end
+
+            return key, default
+        end
+
+        methods.popitem = function()
+            local key, value = next(result._data)
+            if key ~= nil then
+                result._data[key] = nil
+            end
+
+            return key, value
+        end
+
+        methods.setdefault = function(key, default)
+            if result._data[key] == nil then
+                result._data[key] = default
+            end
+
+            return result._data[key]
+        end
+
+        methods.update = function(t)
+            assert(t._is_dict)
+
+            for k, v in t.items() do
+                result._data[k] = v
+            end
+        end
+
+        methods.values = function()
+            return function(self, idx, _) 
+                if idx == nil and key_index ~= nil then
+                    key_index = nil
+                end
+
+                key_index, value = next(result._data, key_index)
+                return value
+            end
+        end
+        
+        setmetatable(result, {
+            __index = function(self, index)
+                if result._data[index] ~= nil then
+                    return result._data[index]
+                end
+                return methods[index]
+            end,
+            __newindex = function(self, index, value)
+                result._data[index] = value
+            end,
+            __call = function(self, _, idx)
+                if idx == nil and key_index ~= nil then
+                    key_index = nil
+                end
+
+                key_index, _ = next(result._data, key_index)
+
+                return key_index            
+            end,
+        })
+        
+        return result
+    end,
+})
+
+local function measure(name, make)
+    local objects = {}
+
+    collectgarbage("collect")
+    collectgarbage("collect")
+    local before = collectgarbage("count")
+    local start = os.clock()
+
+    for i = 1, COUNT do
+        objects[i] = make(i)
+    end
+
+    local elapsed = os.clock() - start
+    local after = collectgarbage("count")
+
+    print(string.format("%-28s %10.1f bytes/object %10.2f ms",
+                        name, (after - before) * 1024 / COUNT, elapsed * 1000))
+    return objects
+end
+
+local implementations = {
+    { "old", old_list, old_dict },
+    { "new", list_of, dict },
+}
+
+for _, implementation in ipairs(implementations) do
+    local name, list_type, dict_type = implementation[1], implementation[2], implementation[3]
+
+    measure(name .. " list {1, 2, 3}", function(i)
+        return list_type { i, i + 1, i + 2 }
+    end)
+    measure(name .. " list + append()", function(i)
+        local object = list_type { i, i + 1, i + 2 }
+        object.append(i)
+        return object
+    end)
+    measure(name .. " dict {a, b}", function(i)
+        return dict_type { a = i, b = i + 1 }
+    end)
+    measure(name .. " dict + get()", function(i)
+        local object = dict_type { a = i, b = i + 1 }
+        object.get("a")
+        return object
+    end)
+end
@@ -0,0 +1,83 @@
+--[[
+    Insert, lookup, delete and iterate workloads of the insertion-ordered
+    dict compared with the previous dict over a plain lua hash table.
+
+    Run from the repository root: lua benchmarks/runtime/dicts.lua
+--]]
+
+local LUAINIT = arg and arg[1] or "pythonlua/luainit.lua"
+local SIZE = 100000
+
+dofile(LUAINIT)
+
+-- The previous dict without the methods, only the hash operations.
+local old_dict_meta = {
+    __index = function(self, index)
+        return self._data[index]
+    end,
+    __newindex = function(self, index, value)
+        self._data[index] = value
+    end,
+}
+
+local function old_dict()
+    return setmetatable({ _data = {} }, old_dict_meta)
+end
+
+local function old_iterate(d)
+    return next, d._data, nil
+end
+
+local function measure(name, work)
+    collectgarbage("collect")
+    local start = os.clock()
+    local result = work()
+    print(string.format("%-28s %10.2f ms", name, (os.clock() - start) * 1000))
+    return result
+end
+
+local implementations = {
+    { "old", old_dict, old_iterate },
+    { "new", dict, iterate },
+}
+
+for _, implementation in ipairs(implementations) do
+    local name, make, iterate_dict = implementation[1], implementation[2], implementation[3]
+    local d = make()
+
+    measure(name .. " insert", function()
+        for i = 1, SIZE do
+            d["key" .. i] = i
+        end
+    end)
+    measure(name .. " lookup", function()
+        local total = 0
+        for i = 1, SIZE do
+            total = total + d["key" .. i]
+        end
+        return total
+    end)
+    measure(name .. " iterate", function()
+        local count = 0
+        for _ = 1, 10 do
+            for _, key in iterate_dict(d) do
+                count = count + 1
+            end
+        end
+        return count
+    end)
+    measure(name .. " delete half", function()
+        for i = 1, SIZE, 2 do
+            d["key" .. i] = nil
+        end
+    end)
+    measure(name .. " iterate after delete", function()
+        local count = 0
+        for _ = 1, 10 do
+            for _, key in iterate_dict(d) do
+                count = count + 1
+            end
+        end
+        return count
+    end)
+end
@@ -0,0 +1,39 @@
+--[[
+    Calls of the builtins and library functions through globals
+    compared with the local aliases written by the hoist_globals option.
+
+    Run from the repository root: lua benchmarks/runtime/globals.lua
+--]]
+
+local LUAINIT = arg and arg[1] or "pythonlua/luainit.lua"
+local CALLS = 1000000
+
+dofile(LUAINIT)
+
+local function measure(name, work)
+    collectgarbage("collect")
+    local start = os.clock()
+    local result = work()
+    print(string.format("%-28s %10.2f ms", name, (os.clock() - start) * 1000))
+    return result
+end
+
+local global_result = measure("globals", function()
+    local total = 0
+    for i = 1, CALLS do
+        total = total + math.floor(i / 3) + math.abs(-i) + math.max(i, 7) + #tostring(i % 10)
+    end
+    return total
+end)
+
+local tostring_, math_abs, math_floor, math_max = tostring, math.abs, math.floor, math.max
+
+local local_result = measure("hoisted locals", function()
+    local total = 0
+    for i = 1, CALLS do
+        total = total + math_floor(i / 3) + math_abs(-i) + math_max(i, 7) + #tostring_(i % 10)
+    end
+    return total
+end)
+
+assert(global_result == local_result)
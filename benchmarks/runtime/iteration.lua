@@ -0,0 +1,62 @@
+--[[
+    Time and garbage of list and dict iteration with the call protocol
+    (for v in object) and with the stateless iterators (iterate(object)).
+
+    Run from the repository root: lua benchmarks/runtime/iteration.lua
+--]]
+
+local LUAINIT = arg and arg[1] or "pythonlua/luainit.lua"
+local SIZE = 1000
+local LOOPS = 500
+
+dofile(LUAINIT)
+
+local function measure(name, loop)
+    collectgarbage("collect")
+    collectgarbage("stop")
+    local before = collectgarbage("count")
+    local start = os.clock()
+
+    for _ = 1, LOOPS do
+        loop()
+    end
+
+    local elapsed = os.clock() - start
+    local after = collectgarbage("count")
+    collectgarbage("restart")
+
+    print(string.format("%-28s %10.1f bytes/loop %10.2f ms",
+                        name, (after - before) * 1024 / LOOPS, elapsed * 1000))
+end
+
+local items = list {}
+local table_ = dict {}
+for i = 1, SIZE do
+    items.append(i)
+    table_[i] = i
+end
+
+measure("list, call protocol", function()
+    for value in items do
+    end
+end)
+measure("list, iterate()", function()
+    for _, value in iterate(items) do
+    end
+end)
+measure("dict, call protocol", function()
+    for key in table_ do
+    end
+end)
+measure("dict, iterate()", function()
+    for _, key in iterate(table_) do
+    end
+end)
+measure("dict.values()", function()
+    for _, value in iterate(table_.values()) do
+    end
+end)
+measure("range()", function()
+    for _, i in iterate(range(SIZE)) do
+    end
+end)
@@ -0,0 +1,93 @@
+--[[
+    Numeric workloads of the lists backed by lua tables compared with
+    the numeric lists backed by the FFI arrays, LuaJIT only.
+
+    Run from the repository root: luajit benchmarks/runtime/numeric.lua
+--]]
+
+local LUAINIT = arg and arg[1] or "pythonlua/luainit.lua"
+local SIZE = 1000000
+
+dofile(LUAINIT)
+
+local function measure(name, work)
+    collectgarbage("collect")
+    local start = os.clock()
+    local result = work()
+    print(string.format("%-28s %10.2f ms", name, (os.clock() - start) * 1000))
+    return result
+end
+
+-- The items are accessed like the translated code does: lists with the
+-- indexing operator, names annotated as numeric lists with the functions.
+local function list_index(values, total)
+    for i = 0, SIZE - 1 do
+        total = total + values[i]
+    end
+    return total
+end
+
+local function list_update(values)
+    for i = 0, SIZE - 1 do
+        values[i] = values[i] * 2
+    end
+end
+
+local function numeric_list_index(values, total)
+    for i = 0, SIZE - 1 do
+        total = total + numeric_list_get(values, i)
+    end
+    return total
+end
+
+local function numeric_list_update(values)
+    for i = 0, SIZE - 1 do
+        numeric_list_set(values, i, numeric_list_get(values, i) * 2)
+    end
+end
+
+local implementations = {
+    { "list", list, list_index, list_update },
+    { "numeric_list", numeric_list, numeric_list_index, numeric_list_update },
+}
+
+for _, implementation in ipairs(implementations) do
+    local name, make = implementation[1], implementation[2]
+    local index, update = implementation[3], implementation[4]
+    collectgarbage("collect")
+    local memory = collectgarbage("count")
+    local values = make()
+
+    measure(name .. " append", function()
+        for i = 0, SIZE - 1 do
+            values.append(i * 0.5)
+        end
+    end)
+    measure(name .. " iterate", function()
+        local total = 0
+        for _ = 1, 10 do
+            for _, value in iterate(values) do
+                total = total + value
+            end
+        end
+        return total
+    end)
+    measure(name .. " index", function()
+        local total = 0
+        for _ = 1, 10 do
+            total = index(values, total)
+        end
+        return total
+    end)
+    measure(name .. " update", function()
+        update(values)
+    end)
+    measure(name .. " full gc", function()
+        for _ = 1, 10 do
+            collectgarbage("collect")
+        end
+    end)
+    print(string.format("%-28s %10.2f KB", name .. " memory",
+                        collectgarbage("count") - memory))
+    values = nil
+end
@@ -0,0 +1,84 @@
+--[[
+    Membership tests of dicts and sets compared with the previous
+    operator_in which iterated the container, and the set operations.
+
+    Run from the repository root: lua benchmarks/runtime/sets.lua
+--]]
+
+local LUAINIT = arg and arg[1] or "pythonlua/luainit.lua"
+local SIZE = 2000
+local LOOKUPS = 10000
+
+dofile(LUAINIT)
+
+-- The previous operator_in, a linear search over the iterated values.
+local function old_operator_in(item, items)
+    for _, v in iterate(items) do
+        if v == item then
+            return true
+        end
+    end
+    return false
+end
+
+local function measure(name, work)
+    collectgarbage("collect")
+    local start = os.clock()
+    local result = work()
+    print(string.format("%-28s %10.2f ms", name, (os.clock() - start) * 1000))
+    return result
+end
+
+local d = dict {}
+local elements = {}
+for i = 1, SIZE do
+    d[i] = i
+    elements[i] = i
+end
+local s = set(elements)
+
+local implementations = {
+    { "old", old_operator_in },
+    { "new", operator_in },
+}
+
+for _, implementation in ipairs(implementations) do
+    local name, contains = implementation[1], implementation[2]
+
+    measure(name .. " dict in", function()
+        local found = 0
+        for i = 1, LOOKUPS do
+            if contains(i % (SIZE * 2), d) then
+                found = found + 1
+            end
+        end
+        return found
+    end)
+    measure(name .. " set in", function()
+        local found = 0
+        for i = 1, LOOKUPS do
+            if contains(i % (SIZE * 2), s) then
+                found = found + 1
+            end
+        end
+        return found
+    end)
+end
+
+local other = set(range(SIZE / 2, SIZE * 3 / 2))
+
+measure("set union", function()
+    for _ = 1, 100 do
+        s.union(other)
+    end
+end)
+measure("set intersection", function()
+    for _ = 1, 100 do
+        s.intersection(other)
+    end
+end)
+measure("set difference", function()
+    for _ = 1, 100 do
+        local _ = s - other
+    end
+end)
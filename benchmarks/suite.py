@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""Translator benchmark suite with machine-readable results"""
+from argparse import ArgumentParser
+import ast
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+from pythonlua import __version__
+from pythonlua.constantfolder import ConstantFolder
+from pythonlua.translator import Translator
+
+from .generators import MODULES
+
+
+PHASES = ("parse", "fold", "analyze", "emit", "translate")
+
+
+def best_of(function, repeat, setup=None):
+    """Return the best wall-clock time of the function calls.
+
+    The result of the untimed setup is passed to the function.
+    """
+    best = None
+    for _ in range(repeat):
+        args = (setup(),) if setup is not None else ()
+        start = time.perf_counter()
+        function(*args)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def run_module(pycode, repeat):
+    """Benchmark the translation phases of the python code"""
+    translator = Translator()
+
+    tree = translator.parse(pycode)
+    symbol_tables = translator.analyze(tree)
+
+    def emit():
+        """Write the lua code into the null device"""
+        with open(os.devnull, "w") as stream:
+            translator.emit(tree, symbol_tables, stream)
+
+    # The folding changes the tree, every run folds a new one.
+    times = {
+        "parse": best_of(lambda: ast.parse(pycode), repeat),
+        "fold": best_of(lambda tree: ConstantFolder().visit(tree), repeat,
+                        setup=lambda: ast.parse(pycode)),
+        "analyze": best_of(lambda: translator.analyze(tree), repeat),
+        "emit": best_of(emit, repeat),
+        "translate": best_of(lambda: translator.translate(pycode), repeat),
+    }
+
+    tracemalloc.start()
+    lua_code = translator.translate(pycode)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    result = {phase + "_ms": times[phase] * 1000 for phase in PHASES}
+    result.update({
+        "source_bytes": len(pycode),
+        "source_lines": pycode.count("\n") + 1,
+        "output_bytes": len(lua_code),
+        "peak_kb": peak / 1024,
+    })
+    return result
+
+
+def run_suite(names, scale, repeat):
+    """Benchmark the generated modules, return the results document"""
+    results = {}
+    for name in names:
+        results[name] = run_module(MODULES[name](scale), repeat)
+
+    return {
+        "version": __version__,
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "scale": scale,
+        "repeat": repeat,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "results": results,
+    }
+
+
+def compare(baseline, current, threshold):
+    """Return the metrics which are worse than the baseline by the threshold"""
+    regressions = []
+    for name, result in current["results"].items():
+        previous = baseline["results"].get(name)
+        if previous is None:
+            continue
+        for metric in [phase + "_ms" for phase in PHASES] + ["peak_kb"]:
+            before = previous.get(metric)
+            after = result[metric]
+            if before and after > before * (1 + threshold):
+                regressions.append((name, metric, before, after))
+    return regressions
+
+
+def print_results(document):
+    """Print the results table"""
+    header = "{:<16}{:>10}" + "{:>16}" * (len(PHASES) + 1)
+    print(header.format("module", "size (KB)",
+                        *[phase + " (ms)" for phase in PHASES], "peak (KB)"))
+
+    row = "{:<16}{:>10}" + "{:>16.1f}" * (len(PHASES) + 1)
+    for name, result in document["results"].items():
+        print(row.format(name, result["source_bytes"] // 1024,
+                         *[result[phase + "_ms"] for phase in PHASES],
+                         result["peak_kb"]))
+
+
+def main():
+    """Benchmark entry point"""
+    parser = ArgumentParser(description="Translator benchmark suite.")
+    parser.add_argument("modules", nargs="*", metavar="MODULE",
+                        help="Generated modules to benchmark: {}. "
+                             "All by default.".format(", ".join(MODULES)))
+    parser.add_argument("--scale", type=int, default=1,
+                        help="Multiply the size of the generated modules.")
+    parser.add_argument("--repeat", type=int, default=5,
+                        help="Number of timed runs, the best one is reported.")
+    parser.add_argument("--output", metavar="FILE",
+                        help="Write the results as JSON into the file.")
+    parser.add_argument("--compare", metavar="FILE",
+                        help="Compare with the results JSON of a previous run.")
+    parser.add_argument("--threshold", type=float, default=0.1,
+                        help="Relative slowdown reported as a regression.")
+    argv = parser.parse_args()
+
+    names = argv.modules or list(MODULES)
+    for name in names:
+        if name not in MODULES:
+            parser.error("unknown module: {}".format(name))
+
+    document = run_suite(names, argv.scale, argv.repeat)
+    print_results(document)
+
+    if argv.output:
+        with open(argv.output, "w") as file:
+            json.dump(document, file, indent=2, sort_keys=True)
+
+    if argv.compare:
+        with open(argv.compare) as file:
+            baseline = json.load(file)
+
+        regressions = compare(baseline, document, argv.threshold)
+        for name, metric, before, after in regressions:
+            print("REGRESSION {} {}: {:.1f} -> {:.1f} ({:+.1f}%)".format(
+                name, metric, before, after, (after / before - 1) * 100))
+        if regressions:
+            return 1
+        print("No regressions against {} (version {}).".format(
+            argv.compare, baseline.get("version", "unknown")))
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""Measure the node visitor wall-clock time and allocations of the current tree"""
+from argparse import ArgumentParser
+from contextlib import contextmanager
+import ast
+import json
+import os
+import sys
+import time
+import tracemalloc
+from unittest import mock
+
+from pythonlua.nodevisitor import NodeVisitor
+from pythonlua.translator import Translator
+
+from .generators import deep_module, wide_module
+
+
+# Results of the tree before the single node visitor, the visitors
+# created by the inline visits are counted there.
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "visitor_baseline.json")
+
+@contextmanager
+def count_instances(cls):
+    """Count the instances of the class created in the block"""
+    counter = [0]
+    original_init = cls.__init__
+
+    def counting_init(self, *args, **kwargs):
+        """Count the instance and call the original constructor"""
+        counter[0] += 1
+        original_init(self, *args, **kwargs)
+
+    with mock.patch.object(cls, "__init__", counting_init):
+        yield counter
+
+
+def measure(pycode, repeat):
+    """Return the best time, the peak memory and the visitor instances"""
+    translator = Translator()
+
+    # Parse once, the benchmark measures the translation itself.
+    tree = ast.parse(pycode)
+    with mock.patch.object(ast, "parse", lambda *args, **kwargs: tree):
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            translator.translate(pycode)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+
+        with count_instances(NodeVisitor) as counter:
+            tracemalloc.start()
+            with open(os.devnull, "w") as stream:
+                translator.translate_to_stream(pycode, stream)
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+    return best, peak, counter[0]
+
+
+def print_comparison(baseline, results):
+    """Print the change of every metric against the baseline results"""
+    print("{:<8}{:>12}{:>16}{:>16}".format("module", "metric", "baseline", "current"))
+    for name, result in results.items():
+        previous = baseline["results"].get(name)
+        if previous is None:
+            continue
+        for metric in ("time_ms", "peak_kb", "visitors"):
+            before, after = previous[metric], result[metric]
+            change = "{:+.1f}%".format((after / before - 1) * 100) if before else ""
+            print("{:<8}{:>12}{:>16.1f}{:>16.1f}  {}".format(
+                name, metric, before, after, change))
+
+
+def main():
+    """Benchmark entry point"""
+    parser = ArgumentParser(description="Node visitor benchmark.")
+    parser.add_argument("--scale", type=int, default=1,
+                        help="Multiply the size of the generated modules.")
+    parser.add_argument("--repeat", type=int, default=5,
+                        help="Number of timed runs, the best one is reported.")
+    parser.add_argument("--output", metavar="FILE",
+                        help="Write the results as JSON into the file.")
+    parser.add_argument("--compare", metavar="FILE", nargs="?", const=BASELINE,
+                        help="Compare with the results JSON of a previous run, "
+                             "the stored baseline by default.")
+    argv = parser.parse_args()
+
+    modules = [
+        ("wide", wide_module(functions=500 * argv.scale)),
+        ("deep", deep_module(functions=100 * argv.scale)),
+    ]
+
+    print("{:<8}{:>12}{:>14}{:>14}{:>12}".format(
+        "module", "size (KB)", "time (ms)", "peak (KB)", "visitors"))
+    results = {}
+    for name, pycode in modules:
+        best, peak, visitors = measure(pycode, argv.repeat)
+        print("{:<8}{:>12}{:>14.1f}{:>14.1f}{:>12}".format(
+            name, len(pycode) // 1024, best * 1000, peak / 1024, visitors))
+        results[name] = {"time_ms": best * 1000, "peak_kb": peak / 1024,
+                         "visitors": visitors}
+
+    document = {"scale": argv.scale, "repeat": argv.repeat, "results": results}
+    if argv.output:
+        with open(argv.output, "w") as file:
+            json.dump(document, file, indent=2, sort_keys=True)
+
+    if argv.compare:
+        with open(argv.compare) as file:
+            baseline = json.load(file)
+        if baseline.get("scale") != argv.scale:
+            parser.error("the baseline was measured with --scale {}".format(
+                baseline.get("scale")))
+        print()
+        print_comparison(baseline, results)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
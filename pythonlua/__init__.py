@@ -1 +1,3 @@
 """Python to lua translator module"""
+
+__version__ = "1.0"
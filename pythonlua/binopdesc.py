@@ -26,12 +26,12 @@ class BinaryOperationDesc:
             "format": _DEFAULT_FORMAT,
         },
         ast.Mod: {
-            "value": "",
-            "format": "math.fmod({left}, {right})",
+            "value": "%",
+            "format": _DEFAULT_FORMAT,
         },
         ast.Pow: {
-            "value": "",
-            "format": "math.pow({left}, {right})",
+            "value": "^",
+            "format": _DEFAULT_FORMAT,
         },
         ast.FloorDiv: {
             "value": "/",
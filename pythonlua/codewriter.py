@@ -0,0 +1,43 @@
+"""Indented lua code writer"""
+
+
+class CodeWriter:
+    """Write indented lua code lines straight into a text stream"""
+    INDENTATION = " " * 4
+
+    def __init__(self, stream, positions=None):
+        self.stream = stream
+        self.indent = 0
+        self.lines = 0
+        self.blocks = []
+
+        # Python positions of the written lines are appended to the given
+        # list, the position is set by the node visitor for every statement.
+        self.positions = positions
+        self.position = None
+
+    def write_line(self, line):
+        """Write a line with the current indentation"""
+        self.write_raw(self.INDENTATION * self.indent + line)
+
+    def write_raw(self, line):
+        """Write a line without any indentation"""
+        if self.lines:
+            self.stream.write("\n")
+        self.stream.write(line)
+        self.lines += 1
+
+        if self.positions is not None:
+            # A long string or a lua code block takes several lines.
+            self.positions.extend([self.position] * (line.count("\n") + 1))
+
+    def begin_block(self):
+        """Begin an indented block"""
+        self.blocks.append(self.lines)
+        self.indent += 1
+
+    def end_block(self):
+        """End the indented block, an empty block is written as an empty line"""
+        self.indent -= 1
+        if self.lines == self.blocks.pop():
+            self.write_raw("")
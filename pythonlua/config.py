@@ -9,6 +9,11 @@ class Config:
             "class": {
                 "return_at_the_end": False,
             },
+            "optimizations": {
+                "constant_folding": True,
+                "hoist_globals": True,
+            },
+            "target": "5.2",
         }
 
         if filename is not None:
@@ -18,13 +23,23 @@ class Config:
         """Load config from the file"""
         try:
             with open(filename, "r") as stream:
-                data = yaml.load(stream)
-                self.data.update(data)
+                data = yaml.safe_load(stream)
+                if data:
+                    self.merge(self.data, data)
         except FileNotFoundError:
             pass # Use a default config if the file not found
         except yaml.YAMLError as ex:
             print(ex)
 
+    @staticmethod
+    def merge(target, source):
+        """Merge the source dict into the target dict recursively"""
+        for key, value in source.items():
+            if isinstance(value, dict) and isinstance(target.get(key), dict):
+                Config.merge(target[key], value)
+            else:
+                target[key] = value
+
     def __getitem__(self, key):
         """Get data values"""
         return self.data[key]
@@ -0,0 +1,310 @@
+"""Constant folding optimization pass"""
+import ast
+import math
+import operator
+import sys
+
+
+_NOT_CONSTANT = object()
+
+# Integers are exact in lua only up to 2 ** 53.
+_MAX_INT = 2 ** 53
+_MAX_STRING = 4096
+_MAX_SHIFT = 63
+
+
+def _floordiv(left, right):
+    """Python floor division, the division by zero is not folded"""
+    return None if right == 0 else left // right
+
+
+def _mod(left, right):
+    """Python modulo with the sign of the divisor"""
+    return None if right == 0 else left % right
+
+
+def _truediv(left, right):
+    """Python true division"""
+    return None if right == 0 else left / right
+
+
+def _pow(left, right):
+    """Python power, huge integer results are not computed"""
+    if isinstance(left, int) and isinstance(right, int):
+        if right < 0 and left == 0:
+            return None
+        if abs(left) > 1 and right > 53:
+            return None
+    result = left ** right
+    return None if isinstance(result, complex) else result
+
+
+def _lshift(left, right):
+    """Python left shift of integers"""
+    return None if right < 0 or right > _MAX_SHIFT else left << right
+
+
+def _rshift(left, right):
+    """Python right shift of integers"""
+    return None if right < 0 else left >> right
+
+
+def _mult(left, right):
+    """Python multiplication including the string repetition"""
+    if isinstance(left, str) or isinstance(right, str):
+        string, count = (left, right) if isinstance(left, str) else (right, left)
+        if not isinstance(count, int) or len(string) * max(count, 0) > _MAX_STRING:
+            return None
+        return string * count
+    return left * right
+
+
+def _add(left, right):
+    """Python addition including the string concatenation"""
+    if isinstance(left, str) != isinstance(right, str):
+        return None
+    return left + right
+
+
+class ConstantFolder:
+    """Fold expressions of literals using python semantics.
+
+    Arithmetic, comparisons, boolean operations, unary operations,
+    string concatenation and conditional expressions of constants are
+    replaced by their values. Expressions whose values can not be
+    represented exactly by a lua literal are left unchanged.
+
+    The tree is changed in place, only the foldable expressions are
+    dispatched, the other nodes are just walked through.
+    """
+    LUACODE = "[[luacode]]"
+
+    # Nodes which hold no expressions.
+    SKIPPED = (ast.expr_context, ast.operator, ast.unaryop, ast.cmpop, ast.boolop,
+               ast.Name)
+
+    NUMERIC = (int, float)
+    INTEGER_ONLY = (ast.LShift, ast.RShift, ast.BitOr, ast.BitAnd, ast.BitXor)
+
+    BINARY = {
+        ast.Add: _add,
+        ast.Sub: operator.sub,
+        ast.Mult: _mult,
+        ast.Div: _truediv,
+        ast.FloorDiv: _floordiv,
+        ast.Mod: _mod,
+        ast.Pow: _pow,
+        ast.LShift: _lshift,
+        ast.RShift: _rshift,
+        ast.BitOr: operator.or_,
+        ast.BitAnd: operator.and_,
+        ast.BitXor: operator.xor,
+    }
+
+    UNARY = {
+        ast.USub: operator.neg,
+        ast.UAdd: operator.pos,
+        ast.Invert: operator.invert,
+    }
+
+    COMPARE = {
+        ast.Eq: operator.eq,
+        ast.NotEq: operator.ne,
+        ast.Lt: operator.lt,
+        ast.LtE: operator.le,
+        ast.Gt: operator.gt,
+        ast.GtE: operator.ge,
+        ast.In: lambda left, right: left in right,
+        ast.NotIn: lambda left, right: left not in right,
+    }
+
+    def __init__(self):
+        self.folders = {
+            ast.BinOp: self.visit_BinOp,
+            ast.UnaryOp: self.visit_UnaryOp,
+            ast.Compare: self.visit_Compare,
+            ast.BoolOp: self.visit_BoolOp,
+            ast.IfExp: self.visit_IfExp,
+        }
+
+    def visit(self, node):
+        """Fold the constant expressions of the tree, return the folded tree"""
+        folder = self.folders.get(node.__class__)
+        if folder is not None:
+            return folder(node)
+
+        self.generic_visit(node)
+        return node
+
+    def generic_visit(self, node):
+        """Replace the foldable expressions below the node in place"""
+        folders = self.folders
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            for name in node._fields:
+                value = getattr(node, name, None)
+                if isinstance(value, list):
+                    for i, item in enumerate(value):
+                        folder = folders.get(item.__class__)
+                        if folder is not None:
+                            value[i] = folder(item)
+                        elif isinstance(item, ast.AST) and \
+                                not isinstance(item, self.SKIPPED):
+                            stack.append(item)
+                    continue
+
+                folder = folders.get(value.__class__)
+                if folder is not None:
+                    setattr(node, name, folder(value))
+                elif isinstance(value, ast.AST) and not isinstance(value, self.SKIPPED):
+                    stack.append(value)
+
+    @staticmethod
+    def get_constant(node):
+        """Return the value of the literal node or _NOT_CONSTANT"""
+        if sys.version_info >= (3, 8):
+            if isinstance(node, ast.Constant):
+                return node.value
+            return _NOT_CONSTANT
+
+        if isinstance(node, ast.Num):
+            return node.n
+        if isinstance(node, ast.Str):
+            return node.s
+        if isinstance(node, ast.NameConstant):
+            return node.value
+        return _NOT_CONSTANT
+
+    @staticmethod
+    def make_constant(value, node):
+        """Create the literal node in place of the node"""
+        if sys.version_info >= (3, 8):
+            constant = ast.Constant(value=value)
+        elif isinstance(value, str):
+            constant = ast.Str(s=value)
+        elif value is None or isinstance(value, bool):
+            constant = ast.NameConstant(value=value)
+        else:
+            constant = ast.Num(n=value)
+        return ast.copy_location(constant, node)
+
+    def is_foldable(self, value):
+        """Check the value can be written as an exact lua literal"""
+        if value is None or isinstance(value, bool):
+            return True
+        if isinstance(value, str):
+            return not value.startswith(self.LUACODE)
+        if isinstance(value, int):
+            return abs(value) <= _MAX_INT
+        if isinstance(value, float):
+            return not math.isinf(value) and not math.isnan(value)
+        return False
+
+    def is_number(self, value):
+        """Check the value is a number, booleans are not numbers here"""
+        return isinstance(value, self.NUMERIC) and not isinstance(value, bool)
+
+    def fold(self, node, function, *args):
+        """Replace the node by the computed value if it is foldable"""
+        try:
+            value = function(*args)
+        except (ArithmeticError, TypeError, ValueError):
+            return node
+
+        if value is None or not self.is_foldable(value):
+            return node
+        return self.make_constant(value, node)
+
+    def visit_BinOp(self, node):
+        """Fold binary operation of literals"""
+        self.generic_visit(node)
+
+        left = self.get_constant(node.left)
+        right = self.get_constant(node.right)
+        if left is _NOT_CONSTANT or right is _NOT_CONSTANT:
+            return node
+        if not self.is_foldable(left) or not self.is_foldable(right):
+            return node
+
+        function = self.BINARY.get(node.op.__class__)
+        if function is None:
+            return node
+
+        if isinstance(left, str) or isinstance(right, str):
+            if not isinstance(node.op, (ast.Add, ast.Mult)):
+                return node
+        elif not self.is_number(left) or not self.is_number(right):
+            return node
+        elif isinstance(node.op, self.INTEGER_ONLY):
+            if not isinstance(left, int) or not isinstance(right, int):
+                return node
+
+        return self.fold(node, function, left, right)
+
+    def visit_UnaryOp(self, node):
+        """Fold unary operation of a literal"""
+        self.generic_visit(node)
+
+        value = self.get_constant(node.operand)
+        if value is _NOT_CONSTANT or not self.is_foldable(value):
+            return node
+
+        if isinstance(node.op, ast.Not):
+            return self.make_constant(not value, node)
+
+        if not self.is_number(value):
+            return node
+        if isinstance(node.op, ast.Invert) and not isinstance(value, int):
+            return node
+
+        return self.fold(node, self.UNARY[node.op.__class__], value)
+
+    def visit_Compare(self, node):
+        """Fold comparison chain of literals"""
+        self.generic_visit(node)
+
+        values = [self.get_constant(node.left)]
+        values.extend(self.get_constant(item) for item in node.comparators)
+        for value in values:
+            if value is _NOT_CONSTANT or not self.is_foldable(value):
+                return node
+
+        def compare():
+            """Evaluate the comparison chain"""
+            for i, operation in enumerate(node.ops):
+                if not self.COMPARE[operation.__class__](values[i], values[i + 1]):
+                    return False
+            return True
+
+        return self.fold(node, compare)
+
+    def visit_BoolOp(self, node):
+        """Fold leading literal operands of the boolean operation"""
+        self.generic_visit(node)
+
+        is_and = isinstance(node.op, ast.And)
+        values = list(node.values)
+        while len(values) > 1:
+            value = self.get_constant(values[0])
+            if value is _NOT_CONSTANT or not self.is_foldable(value):
+                break
+            # 'and' returns the first falsy operand, 'or' the first truthy one.
+            if bool(value) != is_and:
+                return values[0]
+            values.pop(0)
+
+        if len(values) == 1:
+            return values[0]
+
+        node.values = values
+        return node
+
+    def visit_IfExp(self, node):
+        """Fold conditional expression with a literal condition"""
+        self.generic_visit(node)
+
+        value = self.get_constant(node.test)
+        if value is _NOT_CONSTANT or not self.is_foldable(value):
+            return node
+        return node.body if value else node.orelse
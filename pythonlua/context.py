@@ -10,9 +10,11 @@ class Context:
             "token_end_mode": TokenEndMode.LINE_FEED,
             "class_name": "",
             "locals": SymbolsStack(),
-            "globals": SymbolsStack(),  # Not working yet
+            "symbols": None,
             "loop_label_name": "",
             "docstring": False,
+            "self_name": None,
+            "class_methods": frozenset(),
         }
 
         self.ctx_stack = [values]
@@ -0,0 +1,102 @@
+"""Hoist the globals used by the translated code into local aliases"""
+import functools
+import re
+
+
+class GlobalsHoister:
+    """Local aliases of the runtime and library functions.
+
+    The node visitor asks for the name of every builtin it emits. Builtins
+    of the runtime and lua are aliased by the same name (local len = len),
+    functions of the lua libraries get an underscored alias
+    (local math_floor = math.floor). Names bound anywhere in the python
+    module are never hoisted.
+
+    Every alias takes a local of the main chunk and an upvalue of each
+    function using it, lua 5.1 and LuaJIT allow 60 upvalues per function.
+    """
+    MAX_ALIASES = 24
+
+    LUA_BUILTINS = frozenset([
+        "assert", "error", "getmetatable", "ipairs", "next", "pairs", "pcall",
+        "print", "rawequal", "rawget", "rawlen", "rawset", "require", "select",
+        "setmetatable", "tonumber", "tostring", "type", "xpcall",
+    ])
+
+    LUA_LIBRARIES = frozenset([
+        "bit", "bit32", "coroutine", "io", "math", "os", "string", "table",
+    ])
+
+    RUNTIME_GLOBAL = re.compile(r"^(?:function\s+([A-Za-z_]\w*)\s*\(|([A-Za-z_]\w*)\s*=(?!=))",
+                                re.M)
+
+    # Names in the format strings, the placeholders are skipped.
+    FORMAT_NAME = re.compile(r"(?<![{.:\w])[A-Za-z_]\w*(?:\.[A-Za-z_]\w*)?")
+
+    def __init__(self, symbol_tables, runtime_source):
+        self.bound = set()
+        # Underscored aliases must not clash with any name of the module.
+        self.taken = set()
+        for table in symbol_tables.values():
+            self.bound.update(table.parameters, table.assigned, table.globals,
+                              table.nonlocals)
+            self.taken.update(table.referenced)
+        self.taken.update(self.bound)
+
+        self.builtins = (self.LUA_BUILTINS | self.get_runtime_globals(runtime_source)) \
+            - self.bound
+        self.libraries = self.LUA_LIBRARIES - self.bound
+
+        self.aliases = {}
+        self.names = {}
+        self.formats = {}
+
+    @staticmethod
+    @functools.lru_cache(maxsize=4)
+    def get_runtime_globals(runtime_source):
+        """Return the global names defined by the lua initialization code"""
+        return frozenset(first or second for first, second
+                         in GlobalsHoister.RUNTIME_GLOBAL.findall(runtime_source))
+
+    def is_hoistable(self, name):
+        """Check the global name or the library function can be aliased"""
+        library, _, function = name.partition(".")
+        if function:
+            return library in self.libraries and "." not in function
+        return name in self.builtins
+
+    def make_alias(self, name):
+        """Return the new alias of the global name or the name itself"""
+        if len(self.aliases) >= self.MAX_ALIASES or not self.is_hoistable(name):
+            return name
+
+        alias = name.replace(".", "_")
+        while alias != name and alias in self.taken:
+            alias += "_"
+        self.aliases[name] = alias
+        return alias
+
+    def use(self, name):
+        """Return the alias to write in place of the global name"""
+        # Names which are not hoisted are remembered too, most names are not.
+        alias = self.names.get(name)
+        if alias is None:
+            alias = self.names[name] = self.make_alias(name)
+        return alias
+
+    def use_format(self, line):
+        """Return the format string with the aliases of its globals"""
+        result = self.formats.get(line)
+        if result is None:
+            result = self.formats[line] = self.FORMAT_NAME.sub(
+                lambda match: self.use(match.group(0)), line)
+        return result
+
+    def get_header(self):
+        """Return the declaration of the used aliases or None"""
+        if not self.aliases:
+            return None
+
+        names = sorted(self.aliases)
+        return "local {} = {}".format(
+            ", ".join(self.aliases[name] for name in names), ", ".join(names))
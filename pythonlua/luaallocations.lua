@@ -0,0 +1,223 @@
+--[[
+    Allocation tracking of the runtime containers and class instances.
+
+    The constructors of list, dict, set and of the classes created by
+    class() count the allocations by type and by the calling line. The
+    debug hook samples collectgarbage("count") around the lua functions
+    and reports the memory allocated by the functions themselves, without
+    the nested calls and the memory of the tracking. The numbers are
+    approximate as the collector frees memory in between. The top
+    PYTHONLUA_ALLOCATIONS_TOP (20 by default) entries are written at exit
+    into PYTHONLUA_ALLOCATIONS_OUTPUT (pythonlua.allocations by default),
+    the lua locations are replaced by the python ones with
+    python3 -m pythonlua.sourcemap.
+--]]
+do
+    local tracker = {
+        output = os.getenv("PYTHONLUA_ALLOCATIONS_OUTPUT") or "pythonlua.allocations",
+        top = tonumber(os.getenv("PYTHONLUA_ALLOCATIONS_TOP") or "") or 20,
+        types = {},
+        sites = {},
+        functions = {},
+        frames = {},
+    }
+
+    local getinfo = debug.getinfo
+
+    -- Functions of the tracker called by the program, their calls are
+    -- not reported as the functions of the program.
+    local own = {}
+
+    -- Memory allocated by the tracking itself, it is excluded from the
+    -- memory of the functions. A collection during the tracking frees the
+    -- memory of the program as well, so only the growth is counted.
+    local overhead = 0
+
+    local function record(type_name)
+        local before = collectgarbage("count")
+        tracker.types[type_name] = (tracker.types[type_name] or 0) + 1
+
+        -- The caller of the constructor is two levels above.
+        local info = getinfo(3, "Sl")
+        local site = type_name .. " " .. (info and info.short_src .. ":" .. info.currentline or "?")
+        tracker.sites[site] = (tracker.sites[site] or 0) + 1
+        overhead = overhead + math.max(collectgarbage("count") - before, 0)
+    end
+    own[record] = true
+
+    local function track_constructor(callable, type_name)
+        local meta = getmetatable(callable)
+        local call = meta.__call
+        meta.__call = function(...)
+            record(type_name)
+            return call(...)
+        end
+        own[meta.__call] = true
+    end
+    own[track_constructor] = true
+
+    for _, name in ipairs({ "list", "dict", "set", "numeric_list" }) do
+        local callable = rawget(_G, name)
+        if type(callable) == "table" and getmetatable(callable) ~= nil then
+            track_constructor(callable, name)
+        end
+    end
+
+    local class_ = rawget(_G, "class")
+    if class_ ~= nil then
+        class = function(class_init, bases)
+            local c = class_(class_init, bases)
+            -- The class init function names its argument after the class,
+            -- lua 5.1 can not tell the names of the arguments.
+            local ok, name = pcall(debug.getlocal, class_init, 1)
+            track_constructor(c, ok and name or "instance")
+            return c
+        end
+        own[class] = true
+    end
+
+    -- The stack of the lua calls: their frames (false for the C functions
+    -- and the tracker), the memory at the call, the memory of the nested
+    -- calls and whether the call is a tail call which ends together with
+    -- its caller.
+    local frames, starts, nested, tails = {}, {}, {}, {}
+    local depth = 0
+
+    local function get_frame(info)
+        if info.what == "C" or own[info.func] then
+            return false
+        end
+
+        local key = info.short_src .. ":" .. info.linedefined
+        local frame = tracker.frames[key]
+        if frame == nil then
+            frame = (info.what == "main" and "main" or info.name or "?") .. "@" .. key
+            tracker.frames[key] = frame
+        end
+        return frame
+    end
+
+    local function finish(memory)
+        local frame, is_tail = frames[depth], tails[depth]
+        local allocated = memory - starts[depth]
+        local own = allocated - nested[depth]
+        frames[depth], starts[depth], nested[depth], tails[depth] = nil, nil, nil, nil
+        depth = depth - 1
+        if depth > 0 then
+            nested[depth] = nested[depth] + allocated
+        end
+
+        if frame then
+            local entry = tracker.functions[frame]
+            if entry == nil then
+                entry = { 0, 0 }
+                tracker.functions[frame] = entry
+            end
+            entry[1] = entry[1] + math.max(own, 0)
+            entry[2] = entry[2] + 1
+        end
+        return is_tail
+    end
+
+    local function sample(event)
+        local before = collectgarbage("count")
+        local memory = before - overhead
+
+        if event == "call" or event == "tail call" then
+            local info = getinfo(2, "Snf")
+            depth = depth + 1
+            frames[depth] = get_frame(info)
+            starts[depth], nested[depth] = memory, 0
+            tails[depth] = event == "tail call"
+        elseif event == "tail return" then
+            if depth > 0 then
+                finish(memory)
+            end
+        else
+            -- Lua 5.1 and LuaJIT report no tail calls, the calls left above
+            -- the returning function have ended by the tail calls.
+            local info = getinfo(2, "Sf")
+            local frame = get_frame(info)
+            local level = depth
+            while level > 0 and frames[level] ~= frame do
+                level = level - 1
+            end
+            if level > 0 then
+                while depth > level do
+                    finish(memory)
+                end
+                while finish(memory) and depth > 0 do
+                end
+            end
+        end
+
+        overhead = overhead + math.max(collectgarbage("count") - before, 0)
+    end
+
+    local function get_top(counts)
+        local items = {}
+        for key, value in pairs(counts) do
+            items[#items + 1] = { key, value }
+        end
+        table.sort(items, function(a, b)
+            local left = type(a[2]) == "table" and a[2][1] or a[2]
+            local right = type(b[2]) == "table" and b[2][1] or b[2]
+            if left ~= right then
+                return left > right
+            end
+            return a[1] < b[1]
+        end)
+        for i = #items, tracker.top + 1, -1 do
+            items[i] = nil
+        end
+        return items
+    end
+
+    local function write()
+        debug.sethook()
+
+        local lines = { "-- allocations by type", "   count  type" }
+        for _, item in ipairs(get_top(tracker.types)) do
+            lines[#lines + 1] = string.format("%8d  %s", item[2], item[1])
+        end
+
+        lines[#lines + 1] = "-- allocations by call site"
+        lines[#lines + 1] = "   count  type site"
+        for _, item in ipairs(get_top(tracker.sites)) do
+            lines[#lines + 1] = string.format("%8d  %s", item[2], item[1])
+        end
+
+        lines[#lines + 1] = "-- memory allocated by the functions"
+        lines[#lines + 1] = "      KB     calls  function"
+        for _, item in ipairs(get_top(tracker.functions)) do
+            lines[#lines + 1] = string.format("%8.1f  %8d  %s", item[2][1], item[2][2], item[1])
+        end
+
+        local file = io.open(tracker.output, "w")
+        if file == nil then
+            io.stderr:write("cannot write the allocations to " .. tracker.output .. "\n")
+            return
+        end
+        file:write(table.concat(lines, "\n"), "\n")
+        file:close()
+    end
+    own[write] = true
+
+    -- The report is written by the finalizer run when the lua state is
+    -- closed, lua 5.1 and LuaJIT run the finalizers of userdata only.
+    if newproxy ~= nil then
+        tracker.sentinel = newproxy(true)
+        getmetatable(tracker.sentinel).__gc = write
+    else
+        tracker.sentinel = setmetatable({}, { __gc = write })
+    end
+
+    -- The memory of the calls is not sampled under another hook, e.g. the
+    -- profiler. Compiled LuaJIT code calls no hooks, so the JIT is off.
+    if debug.gethook() == nil then
+        if jit ~= nil then
+            jit.off()
+        end
+        debug.sethook(sample, "cr")
+    end
+end
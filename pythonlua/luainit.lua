@@ -25,8 +25,127 @@ chr = string.char
 int = tonumber
 str = tostring
 
+-- The bit library (LuaBitOp) used by the lua 5.1 and LuaJIT targets,
+-- stock lua 5.1 has none. The results are signed 32-bit integers as
+-- the ones of LuaBitOp.
+bit = bit or (function()
+    local floor = math.floor
+
+    local function tobit(x)
+        x = floor(x) % 4294967296
+        if x >= 2147483648 then
+            return x - 4294967296
+        end
+        return x
+    end
+
+    -- The operation combines the bits x and y of the operands into 0 or 1.
+    local function bitwise(a, b, operation)
+        a, b = floor(a) % 4294967296, floor(b) % 4294967296
+        local result, value = 0, 1
+        for _ = 1, 32 do
+            local x, y = a % 2, b % 2
+            result = result + operation(x, y) * value
+            a, b, value = (a - x) / 2, (b - y) / 2, value * 2
+        end
+        return tobit(result)
+    end
+
+    local function and_bits(x, y) return x * y end
+    local function or_bits(x, y) return x + y - x * y end
+    local function xor_bits(x, y) return (x + y) % 2 end
+
+    return {
+        tobit = tobit,
+        band = function(a, b) return bitwise(a, b, and_bits) end,
+        bor = function(a, b) return bitwise(a, b, or_bits) end,
+        bxor = function(a, b) return bitwise(a, b, xor_bits) end,
+        bnot = function(a) return -1 - tobit(a) end,
+        lshift = function(a, n) return tobit(tobit(a) * 2 ^ (n % 32)) end,
+        rshift = function(a, n) return tobit(floor(floor(a) % 4294967296 / 2 ^ (n % 32))) end,
+    }
+end)()
+
+-- Dict keeps the insertion order: keys are appended to the _keys array,
+-- _index maps keys to their positions and _data maps keys to values.
+-- Deleted keys leave holes in _keys which are compacted lazily.
+local g_dict_hole = setmetatable({}, { __tostring = function() return "<hole>" end })
+
+-- The position in the keys array is the control variable, so the
+-- iteration does not depend on the deleted keys.
+local function iterate_dict_keys(self, position)
+    local keys = self._keys
+    for i = position + 1, self._used do
+        local key = keys[i]
+        if key ~= g_dict_hole then
+            return i, key
+        end
+    end
+end
+
+-- Set elements are the keys of the _data hash, the element is
+-- the control variable and the iterated value.
+local function iterate_set(self, element)
+    element = next(self._data, element)
+    return element, element
+end
+
+-- Numeric lists are zero-based FFI arrays, the index is the control variable.
+local function iterate_numeric_list(self, i)
+    i = i + 1
+    if i < self._size then
+        return i, self._data[i]
+    end
+end
+
+local function iterate_chars(s, i)
+    i = i + 1
+    if i <= #s then
+        return i, s:sub(i, i)
+    end
+end
+
+local function iterate_calls(f, control)
+    local value = f(nil, control)
+    return value, value
+end
+
+-- Return a stateless iterator triple over the python iterable,
+-- the iterated value is the second variable of the generic for.
+function iterate(x, s, c)
+    local x_type = type(x)
+    if x_type == "table" then
+        if x._is_list then
+            return ipairs(x._data)
+        end
+        if x._is_dict then
+            return iterate_dict_keys, x, 0
+        end
+        if x._is_set then
+            return iterate_set, x, nil
+        end
+        if x._is_numeric_list then
+            return iterate_numeric_list, x, -1
+        end
+        if getmetatable(x) == nil then
+            return ipairs(x)
+        end
+    elseif x_type == "function" then
+        -- Iterator triples are stateless already, closures are called.
+        if s ~= nil then
+            return x, s, c
+        end
+    elseif x_type == "string" then
+        return iterate_chars, x, 0
+    else
+        error(string.format("'%s' object is not iterable", x_type))
+    end
+
+    return iterate_calls, x, nil
+end
+
 function all(iterable)
-    for element in iterable do
+    for _, element in iterate(iterable) do
         if not element then
             return false
         end
@@ -35,7 +154,7 @@ function all(iterable)
 end
 
 function any(iterable)
-    for element in iterable do
+    for _, element in iterate(iterable) do
         if element then
             return true
         end
@@ -49,9 +168,12 @@ function bool(x)
     end
 
     if type(x) == "table" then
-        if x._is_list or x._is_dict then
+        if x._is_list or x._is_dict or x._is_set then
             return next(x._data) ~= nil
         end
+        if x._is_numeric_list then
+            return x._size > 0
+        end
     end
 
     return true
@@ -76,13 +198,26 @@ function divmod(a, b)
 end
 
 function len(t)
-    if type(t._data) == "table" then
-        return #t._data
+    if type(t) == "table" then
+        if t._is_dict or t._is_set or t._is_numeric_list then
+            return t._size
+        end
+        if type(t._data) == "table" then
+            return #t._data
+        end
     end
 
     return #t
 end
 
+local function range_next(bounds, i)
+    i = i + bounds[2]
+    local to = bounds[1]
+    if (bounds[2] > 0 and i < to) or (bounds[2] < 0 and i > to) then
+        return i, i
+    end
+end
+
 function range(from, to, step)
     assert(from ~= nil)
     
@@ -93,286 +228,870 @@ function range(from, to, step)
 
     step = step or 1
 
-    local i = from
-    
+    return range_next, { to, step }, from - step
+end
+
+function enumerate(t, start)
+    local f, s, c = iterate(t)
+    local index = (start or 0) - 1
+
     return function()
-        ret = i
-        if (step > 0 and i >= to) or (step < 0 and i <= to) then
+        local value
+        c, value = f(s, c)
+        if c == nil then
             return nil
         end
-        
-        i = i + step
-        return ret
+
+        index = index + 1
+        return index, value
     end
 end
 
-function enumerate(t, start)
-    start = start or 0
+-- Iteration positions of the containers iterated with the call protocol.
+local g_iterator_positions = setmetatable({}, { __mode = "k" })
 
-    local data = t
-    if t._is_list then
-        data = t._data
+local function bind_method(self, name, method, cache)
+    local bound = function(...)
+        return method(self, ...)
     end
+    cache[name] = bound
+    return bound
+end
 
-    local i, v = next(data, nil)
-    return function()
-        local index, value = i, v
-        i, v = next(data, i)
+local list_methods = { _is_list = true }
 
-        if index == nil then
-            return nil
+function list_methods.append(self, value)
+    local data = self._data
+    data[#data + 1] = value
+end
+
+function list_methods.extend(self, iterable)
+    local data = self._data
+    if type(iterable) == "table" and iterable._is_list then
+        for _, value in ipairs(iterable._data) do
+            data[#data + 1] = value
         end
+        return
+    end
 
-        return index + start - 1, value
+    for _, value in iterate(iterable) do
+        data[#data + 1] = value
     end
 end
 
-list = {}
-setmetatable(list, {
-    __call = function(_, t)
-        local result = {}
+function list_methods.insert(self, index, value)
+    local data = self._data
+    local size = #data
+    if index < 0 then
+        index = math.max(size + index, 0)
+    elseif index > size then
+        index = size
+    end
+    table.insert(data, index + 1, value)
+end
 
-        result._is_list = true
+function list_methods.remove(self, value)
+    local data = self._data
+    for i, v in ipairs(data) do
+        if value == v then
+            table.remove(data, i)
+            break
+        end
+    end
+end
+
+function list_methods.pop(self, index)
+    local data = self._data
+    if index == nil then
+        index = #data
+    elseif index < 0 then
+        index = #data + index + 1
+    else
+        index = index + 1
+    end
+    return table.remove(data, index)
+end
+
+function list_methods.clear(self)
+    self._data = {}
+end
 
-        result._data = {}
-        for _, v in ipairs(t) do
-            table.insert(result._data, v)
+function list_methods.index(self, value, start, end_)
+    local data = self._data
+    start = start or 0
+    end_ = end_ or #data
+
+    for i = start + 1, math.min(end_, #data) do
+        if data[i] == value then
+            return i - 1
         end
-    
-        local methods = {}
+    end
+
+    return nil
+end
 
-        methods.append = function(value)
-            table.insert(result._data, value)
+function list_methods.count(self, value)
+    local cnt = 0
+    for _, v in ipairs(self._data) do
+        if v == value then
+            cnt = cnt + 1
         end
+    end
 
-        methods.extend = function(iterable)
-            for value in iterable do
-                table.insert(result._data, value)
-            end
+    return cnt
+end
+
+function list_methods.sort(self, key, reverse)
+    local compare
+    if key == nil then
+        compare = function(a, b) return a < b end
+    else
+        compare = function(a, b) return key(a) < key(b) end
+    end
+
+    if reverse then
+        local ascending = compare
+        compare = function(a, b) return ascending(b, a) end
+    end
+
+    table.sort(self._data, compare)
+end
+
+function list_methods.reverse(self)
+    local data = self._data
+    local i, j = 1, #data
+    while i < j do
+        data[i], data[j] = data[j], data[i]
+        i = i + 1
+        j = j - 1
+    end
+end
+
+function list_methods.copy(self)
+    return list(self)
+end
+
+local list_meta = {}
+
+list_meta.__index = function(self, index)
+    if type(index) == "number" then
+        if index < 0 then
+            index = #self._data + index
         end
+        return rawget(self._data, index + 1)
+    end
+
+    local method = list_methods[index]
+    if type(method) == "function" then
+        -- Bound methods are created once per instance on the first use.
+        return bind_method(self, index, method, self)
+    end
+    return method
+end
 
-        methods.insert = function(index, value)
-            table.insert(result._data, index, value)
+list_meta.__newindex = function(self, index, value)
+    if type(index) == "number" then
+        if index < 0 then
+            index = #self._data + index
         end
+        self._data[index + 1] = value
+        return
+    end
+    rawset(self, index, value)
+end
+
+list_meta.__call = function(self, _, idx)
+    local position = nil
+    if idx ~= nil then
+        position = g_iterator_positions[self]
+    end
+
+    local value
+    position, value = next(self._data, position)
+    g_iterator_positions[self] = position
+
+    return value
+end
 
-        methods.remove = function(value)
-            for i, v in ipairs(result._data) do
-                if value == v then
-                    table.remove(result._data, i)
-                    break
-                end
+list = {}
+setmetatable(list, {
+    __call = function(_, t, s, c)
+        local data = {}
+
+        if t == nil then
+            -- An empty list.
+        elseif type(t) == "table" and t._is_list then
+            for i, value in ipairs(t._data) do
+                data[i] = value
+            end
+        else
+            for _, value in iterate(t, s, c) do
+                data[#data + 1] = value
             end
         end
 
-        methods.pop = function(index)
-            index = index or #result._data
-            local value = result._data[index]
-            table.remove(result._data, index)
-            return value
+        return setmetatable({ _data = data }, list_meta)
+    end,
+})
+
+-- The list of a fresh table (a literal, varargs or the result of a
+-- comprehension) which is adopted as is, list() copies as in python.
+function list_of(t)
+    return setmetatable({ _data = t }, list_meta)
+end
+
+-- Lists of numbers backed by the FFI arrays of LuaJIT. The elements are
+-- doubles like the lua numbers, the array grows twice when it is full.
+local g_ffi = nil
+local g_numeric_array = nil
+
+local function numeric_list_reserve(self, capacity)
+    if capacity <= self._capacity then
+        return
+    end
+    if g_ffi == nil then
+        g_ffi = require("ffi")
+        g_numeric_array = g_ffi.typeof("double[?]")
+    end
+
+    capacity = math.max(capacity, self._capacity * 2, 8)
+    local data = g_numeric_array(capacity)
+    if self._size > 0 then
+        g_ffi.copy(data, self._data, self._size * g_ffi.sizeof("double"))
+    end
+    self._data = data
+    self._capacity = capacity
+end
+
+local function numeric_list_position(self, index, message)
+    if index < 0 then
+        index = self._size + index
+    end
+    if index < 0 or index >= self._size then
+        error(message)
+    end
+    return index
+end
+
+local numeric_list_methods = { _is_numeric_list = true }
+
+function numeric_list_methods.append(self, value)
+    local size = self._size
+    if size == self._capacity then
+        numeric_list_reserve(self, size + 1)
+    end
+    self._data[size] = value
+    self._size = size + 1
+end
+
+function numeric_list_methods.extend(self, iterable)
+    local append = numeric_list_methods.append
+    for _, value in iterate(iterable) do
+        append(self, value)
+    end
+end
+
+function numeric_list_methods.insert(self, index, value)
+    local size = self._size
+    if index < 0 then
+        index = math.max(size + index, 0)
+    elseif index > size then
+        index = size
+    end
+
+    numeric_list_reserve(self, size + 1)
+    local data = self._data
+    for i = size, index + 1, -1 do
+        data[i] = data[i - 1]
+    end
+    data[index] = value
+    self._size = size + 1
+end
+
+function numeric_list_methods.pop(self, index)
+    local size = self._size
+    index = numeric_list_position(self, index or size - 1, "pop index out of range")
+
+    local data = self._data
+    local value = data[index]
+    for i = index, size - 2 do
+        data[i] = data[i + 1]
+    end
+    self._size = size - 1
+    return value
+end
+
+function numeric_list_methods.remove(self, value)
+    local index = numeric_list_methods.index(self, value)
+    if index == nil then
+        error("list.remove(x): x not in list")
+    end
+    numeric_list_methods.pop(self, index)
+end
+
+function numeric_list_methods.clear(self)
+    self._size = 0
+end
+
+function numeric_list_methods.index(self, value, start, end_)
+    local data = self._data
+    start = start or 0
+    end_ = math.min(end_ or self._size, self._size)
+
+    for i = start, end_ - 1 do
+        if data[i] == value then
+            return i
         end
+    end
+
+    return nil
+end
 
-        methods.clear = function()
-            result._data = {}
+function numeric_list_methods.count(self, value)
+    local data = self._data
+    local cnt = 0
+    for i = 0, self._size - 1 do
+        if data[i] == value then
+            cnt = cnt + 1
         end
+    end
 
-        methods.index = function(value, start, end_)
-            start = start or 1
-            end_ = end_ or #result._data
+    return cnt
+end
 
-            for i = start, end_, 1 do
-                if result._data[i] == value then
-                    return i
-                end
-            end
+function numeric_list_methods.sort(self, key, reverse)
+    local values = list(self)
+    values.sort(key, reverse)
 
-            return nil
+    local data = self._data
+    for i, value in ipairs(values._data) do
+        data[i - 1] = value
+    end
+end
+
+function numeric_list_methods.reverse(self)
+    local data = self._data
+    local i, j = 0, self._size - 1
+    while i < j do
+        data[i], data[j] = data[j], data[i]
+        i = i + 1
+        j = j - 1
+    end
+end
+
+function numeric_list_methods.copy(self)
+    return numeric_list(self)
+end
+
+local numeric_list_meta = {}
+
+numeric_list_meta.__index = function(self, index)
+    if type(index) == "number" then
+        if index < 0 then
+            index = self._size + index
+        end
+        if index >= 0 and index < self._size then
+            return self._data[index]
         end
+        return nil
+    end
 
-        methods.count = function(value)
-            local cnt = 0
-            for _, v in ipairs(result._data) do
-                if v == value then
-                    cnt = cnt + 1
-                end
-            end
+    local method = numeric_list_methods[index]
+    if type(method) == "function" then
+        return bind_method(self, index, method, self)
+    end
+    return method
+end
+
+numeric_list_meta.__newindex = function(self, index, value)
+    if type(index) == "number" then
+        index = numeric_list_position(self, index, "list assignment index out of range")
+        self._data[index] = value
+        return
+    end
+    rawset(self, index, value)
+end
+
+-- Items of the names annotated as numeric lists are accessed with these
+-- functions, other values fall back to the indexing operator.
+function numeric_list_get(self, index)
+    if getmetatable(self) ~= numeric_list_meta then
+        return self[index]
+    end
+
+    if index < 0 then
+        index = self._size + index
+    end
+    if index >= 0 and index < self._size then
+        return self._data[index]
+    end
+    return nil
+end
+
+function numeric_list_set(self, index, value)
+    if getmetatable(self) ~= numeric_list_meta then
+        self[index] = value
+        return
+    end
 
-            return cnt
+    index = numeric_list_position(self, index, "list assignment index out of range")
+    self._data[index] = value
+end
+
+function numeric_list(t, s, c)
+    local self = setmetatable({ _data = nil, _size = 0, _capacity = 0 },
+                              numeric_list_meta)
+
+    if t == nil then
+        numeric_list_reserve(self, 8)
+    elseif type(t) == "table" and getmetatable(t) == nil then
+        -- A literal is copied at once.
+        local size = #t
+        numeric_list_reserve(self, size)
+        local data = self._data
+        for i = 1, size do
+            data[i - 1] = t[i]
+        end
+        self._size = size
+    else
+        numeric_list_reserve(self, 8)
+        local append = numeric_list_methods.append
+        for _, value in iterate(t, s, c) do
+            append(self, value)
         end
+    end
 
-        methods.sort = function(key, reverse)
-            key = key or nil
-            reverse = reverse or false
+    return self
+end
 
-            table.sort(result._data, function(a, b)
-                if reverse then
-                    return a < b
-                end
+local function dict_insert(self, key, value)
+    local used = self._used + 1
+    self._keys[used] = key
+    self._index[key] = used
+    self._data[key] = value
+    self._used = used
+    self._size = self._size + 1
+end
 
-                return a > b
-            end)
+local function dict_compact(self)
+    local keys, index = {}, {}
+    local size = 0
+    for _, key in ipairs(self._keys) do
+        if key ~= g_dict_hole then
+            size = size + 1
+            keys[size] = key
+            index[key] = size
         end
+    end
+    self._keys = keys
+    self._index = index
+    self._used = size
+end
 
-        methods.reverse = function()
-            local new_data = {}
-            for i = #result._data, 1, -1 do
-                table.insert(new_data, result._data[i])
-            end
+local function dict_delete(self, key)
+    local position = self._index[key]
+    if position == nil then
+        return
+    end
+
+    local keys = self._keys
+    keys[position] = g_dict_hole
+    self._index[key] = nil
+    self._data[key] = nil
+    self._size = self._size - 1
+
+    -- Trailing holes are dropped at once, the others are compacted
+    -- when they take more than a half of the keys array.
+    local used = self._used
+    while used > 0 and keys[used] == g_dict_hole do
+        keys[used] = nil
+        used = used - 1
+    end
+    self._used = used
+
+    if used > 32 and self._size * 2 < used then
+        dict_compact(self)
+    end
+end
 
-            result._data = new_data
+local function iterate_dict_items(self, key)
+    local position = 0
+    if key ~= nil then
+        position = self._index[key]
+        if position == nil then
+            error("dictionary changed size during iteration")
         end
+    end
 
-        methods.copy = function()
-            return list(result._data)
+    local keys = self._keys
+    for i = position + 1, self._used do
+        local next_key = keys[i]
+        if next_key ~= g_dict_hole then
+            return next_key, self._data[next_key]
         end
+    end
+end
 
-        local iterator_index = nil
+local function iterate_dict_values(self, position)
+    local keys = self._keys
+    for i = position + 1, self._used do
+        local key = keys[i]
+        if key ~= g_dict_hole then
+            return i, self._data[key]
+        end
+    end
+end
 
-        setmetatable(result, {
-            __index = function(self, index)
-                if type(index) == "number" then
-                    if index < 0 then
-                        index = #result._data + index
-                    end
-                    return rawget(result._data, index + 1)
-                end
+local dict_methods = { _is_dict = true }
 
-                return methods[index]
-            end,
-            __newindex = function(self, index, value)
-                result._data[index] = value
-            end,
-            __call = function(self, _, idx)
-                if idx == nil and iterator_index ~= nil then
-                    iterator_index = nil
-                end
+function dict_methods.clear(self)
+    self._data = {}
+    self._keys = {}
+    self._index = {}
+    self._used = 0
+    self._size = 0
+end
 
-                local v = nil
-                iterator_index, v = next(result._data, iterator_index)
+function dict_methods.copy(self)
+    return dict(self)
+end
 
-                return v
-            end,
-        })
+function dict_methods.get(self, key, default)
+    local value = self._data[key]
+    if value == nil then
+        return default
+    end
 
-        return result
-    end,
-})
+    return value
+end
 
-dict = {}
-setmetatable(dict, {
-    __call = function(_, t)
-        local result = {}
+function dict_methods.items(self)
+    return iterate_dict_items, self, nil
+end
 
-        result._is_dict = true
+function dict_methods.keys(self)
+    return iterate_dict_keys, self, 0
+end
 
-        result._data = {}
-        for k, v in pairs(t) do
-            result._data[k] = v
-        end
+function dict_methods.pop(self, key, default)
+    local value = self._data[key]
+    if value == nil then
+        return default
+    end
 
-        local methods = {}
+    dict_delete(self, key)
+    return value
+end
 
-        local key_index = nil
+function dict_methods.popitem(self)
+    local key = self._keys[self._used]
+    if key == nil then
+        error("popitem(): dictionary is empty")
+    end
 
-        methods.clear = function()
-            result._data = {}
-        end
+    local value = self._data[key]
+    dict_delete(self, key)
+    return key, value
+end
 
-        methods.copy = function()
-            return dict(result._data)
-        end
+function dict_methods.setdefault(self, key, default)
+    local value = self._data[key]
+    if value == nil and default ~= nil then
+        dict_insert(self, key, default)
+        return default
+    end
 
-        methods.get = function(key, default)
-            default = default or nil
-            if result._data[key] == nil then
-                return default
-            end
+    return value
+end
+
+function dict_methods.update(self, t)
+    assert(t._is_dict)
 
-            return result._data[key]
+    for key, value in iterate_dict_items, t, nil do
+        self[key] = value
+    end
+end
+
+function dict_methods.values(self)
+    return iterate_dict_values, self, 0
+end
+
+local dict_meta = {}
+
+dict_meta.__index = function(self, index)
+    local value = self._data[index]
+    if value ~= nil then
+        return value
+    end
+
+    local method = dict_methods[index]
+    if type(method) == "function" then
+        -- Bound methods are cached in a table of the instance, so the keys
+        -- of the dict data take precedence over them. A weak table keyed
+        -- by the dict would never free it before lua 5.2 (no ephemerons).
+        local cache = rawget(self, "_methods")
+        if cache == nil then
+            cache = {}
+            rawset(self, "_methods", cache)
         end
+        return cache[index] or bind_method(self, index, method, cache)
+    end
+    return method
+end
 
-        methods.items = function()
-            return pairs(result._data)
+dict_meta.__newindex = function(self, index, value)
+    local data = self._data
+    if data[index] == nil then
+        if value ~= nil then
+            dict_insert(self, index, value)
         end
+    elseif value == nil then
+        dict_delete(self, index)
+    else
+        data[index] = value
+    end
+end
+
+dict_meta.__call = function(self, _, key)
+    return (iterate_dict_items(self, key))
+end
 
-        methods.keys = function()
-            return function(self, idx, _) 
-                if idx == nil and key_index ~= nil then
-                    key_index = nil
-                end
+local function dict_new()
+    return setmetatable({ _data = {}, _keys = {}, _index = {}, _used = 0, _size = 0 },
+                        dict_meta)
+end
 
-                key_index, _ = next(result._data, key_index)
-                return key_index
+dict = {}
+setmetatable(dict, {
+    __call = function(_, t, s, c)
+        local result = dict_new()
+
+        if t == nil then
+            -- An empty dict.
+        elseif type(t) == "function" then
+            for key, value in t, s, c do
+                result[key] = value
+            end
+        elseif t._is_dict then
+            for key, value in iterate_dict_items, t, nil do
+                dict_insert(result, key, value)
+            end
+        elseif type(s) == "table" then
+            -- A literal is given as the arrays of keys and values.
+            for i = 1, #t do
+                result[t[i]] = s[i]
+            end
+        else
+            for key, value in pairs(t) do
+                result[key] = value
             end
         end
 
-        methods.pop = function(key, default)
-            default = default or nil
-            if result._data[key] ~= nil then
-                local value = result._data[key]
-                result._data[key] = nil 
-                return key, value
-            end
+        return result
+    end,
+})
+
+local set_meta = {}
+
+local function set_new()
+    return setmetatable({ _data = {}, _size = 0 }, set_meta)
+end
+
+local set_methods = { _is_set = true }
+
+function set_methods.add(self, element)
+    local data = self._data
+    if data[element] == nil then
+        data[element] = true
+        self._size = self._size + 1
+    end
+end
+
+function set_methods.discard(self, element)
+    local data = self._data
+    if data[element] ~= nil then
+        data[element] = nil
+        self._size = self._size - 1
+    end
+end
+
+function set_methods.remove(self, element)
+    if self._data[element] == nil then
+        error(string.format("KeyError: %s", tostring(element)))
+    end
+    set_methods.discard(self, element)
+end
+
+function set_methods.pop(self)
+    local element = next(self._data)
+    if element == nil then
+        error("pop from an empty set")
+    end
+    set_methods.discard(self, element)
+    return element
+end
+
+function set_methods.clear(self)
+    self._data = {}
+    self._size = 0
+end
+
+function set_methods.copy(self)
+    local result = set_new()
+    local data = result._data
+    for element in pairs(self._data) do
+        data[element] = true
+    end
+    result._size = self._size
+    return result
+end
+
+function set_methods.update(self, iterable)
+    local add = set_methods.add
+    for _, element in iterate(iterable) do
+        add(self, element)
+    end
+end
+
+function set_methods.union(self, iterable)
+    local result = set_methods.copy(self)
+    set_methods.update(result, iterable)
+    return result
+end
+
+function set_methods.intersection(self, iterable)
+    local other = iterable
+    if type(other) ~= "table" or not other._is_set then
+        other = set(iterable)
+    end
+
+    -- Only the smaller set is iterated.
+    local small, large = self._data, other._data
+    if other._size < self._size then
+        small, large = large, small
+    end
 
-            return key, default
+    local result = set_new()
+    local add = set_methods.add
+    for element in pairs(small) do
+        if large[element] ~= nil then
+            add(result, element)
         end
+    end
+    return result
+end
 
-        methods.popitem = function()
-            local key, value = next(result._data)
-            if key ~= nil then
-                result._data[key] = nil
-            end
+function set_methods.difference(self, iterable)
+    local result = set_methods.copy(self)
+    local discard = set_methods.discard
+    for _, element in iterate(iterable) do
+        discard(result, element)
+    end
+    return result
+end
 
-            return key, value
+function set_methods.symmetric_difference(self, iterable)
+    local other = iterable
+    if type(other) ~= "table" or not other._is_set then
+        other = set(iterable)
+    end
+
+    local result = set_methods.copy(self)
+    local data = self._data
+    local add, discard = set_methods.add, set_methods.discard
+    for element in pairs(other._data) do
+        if data[element] ~= nil then
+            discard(result, element)
+        else
+            add(result, element)
         end
+    end
+    return result
+end
 
-        methods.setdefault = function(key, default)
-            if result._data[key] == nil then
-                result._data[key] = default
-            end
+function set_methods.issubset(self, iterable)
+    local other = iterable
+    if type(other) ~= "table" or not other._is_set then
+        other = set(iterable)
+    end
 
-            return result._data[key]
+    if self._size > other._size then
+        return false
+    end
+    local data = other._data
+    for element in pairs(self._data) do
+        if data[element] == nil then
+            return false
         end
+    end
+    return true
+end
 
-        methods.update = function(t)
-            assert(t._is_dict)
+function set_methods.issuperset(self, iterable)
+    local data = self._data
+    for _, element in iterate(iterable) do
+        if data[element] == nil then
+            return false
+        end
+    end
+    return true
+end
 
-            for k, v in t.items() do
-                result._data[k] = v
-            end
+function set_methods.isdisjoint(self, iterable)
+    local data = self._data
+    for _, element in iterate(iterable) do
+        if data[element] ~= nil then
+            return false
         end
+    end
+    return true
+end
+
+set_meta.__index = function(self, index)
+    local method = set_methods[index]
+    if type(method) == "function" then
+        return bind_method(self, index, method, self)
+    end
+    return method
+end
+
+set_meta.__sub = set_methods.difference
+-- The bitwise operators are the metamethods of lua 5.3 and newer, the
+-- older targets call them through operator_bor and the others.
+set_meta.__bor = set_methods.union
+set_meta.__band = set_methods.intersection
+set_meta.__bxor = set_methods.symmetric_difference
+set_meta.__le = set_methods.issubset
+
+set_meta.__lt = function(self, other)
+    return self._size < other._size and set_methods.issubset(self, other)
+end
+
+set_meta.__eq = function(self, other)
+    if not other._is_set then
+        return false
+    end
+    return self._size == other._size and set_methods.issubset(self, other)
+end
 
-        methods.values = function()
-            return function(self, idx, _) 
-                if idx == nil and key_index ~= nil then
-                    key_index = nil
-                end
+set = {}
+setmetatable(set, {
+    __call = function(_, t, s, c)
+        local result = set_new()
+        if t == nil then
+            return result
+        end
 
-                key_index, value = next(result._data, key_index)
-                return value
+        local data = result._data
+        local size = 0
+        for _, element in iterate(t, s, c) do
+            if data[element] == nil then
+                data[element] = true
+                size = size + 1
             end
         end
-        
-        setmetatable(result, {
-            __index = function(self, index)
-                if result._data[index] ~= nil then
-                    return result._data[index]
-                end
-                return methods[index]
-            end,
-            __newindex = function(self, index, value)
-                result._data[index] = value
-            end,
-            __call = function(self, _, idx)
-                if idx == nil and key_index ~= nil then
-                    key_index = nil
-                end
-
-                key_index, _ = next(result._data, key_index)
-
-                return key_index            
-            end,
-        })
-        
+        result._size = size
+
         return result
     end,
 })
@@ -385,9 +1104,65 @@ function staticmethod(old_fun)
     return wrapper
 end
 
+-- The bitwise operators of the targets before lua 5.3, which have no
+-- bitwise metamethods: numbers use the bit library, other operands (sets)
+-- use their lua 5.3 metamethods.
+function operator_bor(a, b)
+    local meta = getmetatable(a)
+    if meta ~= nil and meta.__bor ~= nil then
+        return meta.__bor(a, b)
+    end
+    return (bit32 or bit).bor(a, b)
+end
+
+function operator_band(a, b)
+    local meta = getmetatable(a)
+    if meta ~= nil and meta.__band ~= nil then
+        return meta.__band(a, b)
+    end
+    return (bit32 or bit).band(a, b)
+end
+
+function operator_bxor(a, b)
+    local meta = getmetatable(a)
+    if meta ~= nil and meta.__bxor ~= nil then
+        return meta.__bxor(a, b)
+    end
+    return (bit32 or bit).bxor(a, b)
+end
+
+-- The power of the targets since lua 5.3, where '^' returns a float: the
+-- power of integers is an integer as in python while it fits.
+function operator_pow(a, b)
+    if math.type(a) ~= "integer" or math.type(b) ~= "integer" or b < 0 then
+        return a ^ b
+    end
+
+    local result = a ^ b
+    if result <= -2 ^ 63 or result >= 2 ^ 63 then
+        return result
+    end
+
+    local value = 1
+    while b > 0 do
+        if b % 2 == 1 then
+            value = value * a
+        end
+        a = a * a
+        b = math.floor(b / 2)
+    end
+    return value
+end
+
 function operator_in(item, items)
     if type(items) == "table" then
-        for v in items do
+        -- Keys of dicts and elements of sets are hashed.
+        local meta = getmetatable(items)
+        if meta == dict_meta or meta == set_meta then
+            return items._data[item] ~= nil
+        end
+
+        for _, v in iterate(items) do
             if v == item then
                 return true
             end
@@ -414,26 +1189,47 @@ function class(class_init, bases)
     c._bases = bases
     
     c = class_init(c)
-    
+
+    -- All instances of the class share a single metatable.
+    local instance_meta = {
+        __index = function(object, idx)
+            local method = c[idx]
+            if type(method) ~= "function" then
+                return method
+            end
+
+            -- Bound methods are created once per instance and method and
+            -- recreated only when the class attribute changes. They are
+            -- cached by the instance, a weak table keyed by the instance
+            -- would never free it before lua 5.2 (no ephemerons).
+            local cache = rawget(object, "__bound__")
+            if cache == nil then
+                cache = {}
+                rawset(object, "__bound__", cache)
+            end
+
+            local bound = cache[idx]
+            if bound == nil or bound[1] ~= method then
+                bound = {
+                    method,
+                    function(...)
+                        return method(object, ...)
+                    end,
+                }
+                cache[idx] = bound
+            end
+
+            return bound[2]
+        end,
+    }
+
     local mt = getmetatable(c) or {}
     mt.__call = function(_, ...)
-        local object = {}
-        
-        setmetatable(object, {
-            __index = function(tbl, idx)
-                local method = c[idx]
-                if type(method) == "function" then
-                    return function(...)
-                        return c[idx](object, ...) 
-                    end
-                end
-                
-                return method
-            end,
-        })
-    
-        if type(object.__init__) == "function" then
-            object.__init__(...)
+        local object = setmetatable({ __class__ = c }, instance_meta)
+
+        local init = c.__init__
+        if type(init) == "function" then
+            init(object, ...)
         end
         
         return object
@@ -0,0 +1,101 @@
+--[[
+    Sampling profiler of the translated code.
+
+    The debug hook samples the call stack of the main thread every
+    PYTHONLUA_PROFILE_PERIOD virtual machine instructions (1000 by default)
+    or, when PYTHONLUA_PROFILE_MODE is "line", at every executed line.
+    Hits are aggregated by function and written at exit as collapsed
+    stacks into PYTHONLUA_PROFILE_OUTPUT (pythonlua.profile by default):
+
+        main@module.lua:0;scale@module.lua:1190 42
+
+    The stacks can be rendered by flamegraph.pl, the lua locations are
+    replaced by the python ones with python3 -m pythonlua.sourcemap.
+--]]
+do
+    local MAX_DEPTH = 128
+
+    local profiler = {
+        output = os.getenv("PYTHONLUA_PROFILE_OUTPUT") or "pythonlua.profile",
+        mode = os.getenv("PYTHONLUA_PROFILE_MODE") or "count",
+        period = tonumber(os.getenv("PYTHONLUA_PROFILE_PERIOD") or "") or 1000,
+        samples = {},
+        -- A function is named by the first name lua reports for it, so the
+        -- hits of all its call sites are aggregated.
+        names = {},
+        frames = {},
+    }
+
+    local getinfo = debug.getinfo
+    local concat = table.concat
+
+    local function get_frame(info)
+        local key = info.short_src .. ":" .. info.linedefined
+        local frame = profiler.frames[key]
+        if frame == nil then
+            local name = info.what == "main" and "main" or info.name or "?"
+            frame = name .. "@" .. key
+            profiler.frames[key] = frame
+        end
+        return frame
+    end
+
+    local function sample(_, line)
+        local stack = {}
+        local level = 2
+        local info = getinfo(level, "Sn")
+        while info ~= nil and level < MAX_DEPTH do
+            if info.what ~= "C" then
+                stack[#stack + 1] = get_frame(info)
+            end
+            level = level + 1
+            info = getinfo(level, "Sn")
+        end
+
+        -- Collapsed stacks start with the outermost frame.
+        local size = #stack
+        for i = 1, math.floor(size / 2) do
+            stack[i], stack[size - i + 1] = stack[size - i + 1], stack[i]
+        end
+        if line ~= nil then
+            stack[size + 1] = getinfo(2, "S").short_src .. ":" .. line
+        end
+
+        local key = concat(stack, ";")
+        local samples = profiler.samples
+        samples[key] = (samples[key] or 0) + 1
+    end
+
+    local function write()
+        debug.sethook()
+
+        local lines = {}
+        for stack, count in pairs(profiler.samples) do
+            lines[#lines + 1] = stack .. " " .. count
+        end
+        table.sort(lines)
+
+        local file = io.open(profiler.output, "w")
+        if file == nil then
+            io.stderr:write("cannot write the profile to " .. profiler.output .. "\n")
+            return
+        end
+        file:write(concat(lines, "\n"), "\n")
+        file:close()
+    end
+
+    -- The profile is written by the finalizer run when the lua state is
+    -- closed, lua 5.1 and LuaJIT run the finalizers of userdata only.
+    if newproxy ~= nil then
+        profiler.sentinel = newproxy(true)
+        getmetatable(profiler.sentinel).__gc = write
+    else
+        profiler.sentinel = setmetatable({}, { __gc = write })
+    end
+
+    if profiler.mode == "line" then
+        debug.sethook(sample, "l")
+    else
+        debug.sethook(sample, "", profiler.period)
+    end
+end
@@ -0,0 +1,96 @@
+"""Lua version specific code generation"""
+import ast
+
+
+def _bit_library(library):
+    """Return the operation formats calling the functions of the bit library"""
+    return {
+        "binary": {
+            ast.LShift: library + ".lshift({left}, {right})",
+            ast.RShift: library + ".rshift({left}, {right})",
+            ast.BitOr: library + ".bor({left}, {right})",
+            ast.BitAnd: library + ".band({left}, {right})",
+            ast.BitXor: library + ".bxor({left}, {right})",
+        },
+        # The bit library takes numbers only, other operands (sets) are
+        # combined by the runtime through their lua 5.3 metamethods.
+        "dynamic": {
+            ast.BitOr: "operator_bor({left}, {right})",
+            ast.BitAnd: "operator_band({left}, {right})",
+            ast.BitXor: "operator_bxor({left}, {right})",
+        },
+        "unary": {
+            ast.Invert: library + ".bnot({value})",
+        },
+    }
+
+
+_NATIVE_OPERATORS = {
+    "binary": {
+        ast.FloorDiv: "{left} // {right}",
+        ast.LShift: "{left} << {right}",
+        ast.RShift: "{left} >> {right}",
+        ast.BitOr: "{left} | {right}",
+        ast.BitAnd: "{left} & {right}",
+        ast.BitXor: "{left} ~ {right}",
+    },
+    # The power of integers is an integer as in python, '^' returns a float.
+    "dynamic": {
+        ast.Pow: "operator_pow({left}, {right})",
+    },
+    "unary": {
+        ast.Invert: "~{value}",
+    },
+}
+
+
+class LuaTarget:
+    """Lua version the code is generated for.
+
+    The target overrides the formats of the operations which differ
+    between lua versions: the integer division and bitwise operations
+    are native since lua 5.3, lua 5.2 has the bit32 library, LuaJIT and
+    lua 5.1 use the bit library (LuaBitOp). The bitwise operations of the
+    operands which may be sets call the runtime before lua 5.3, the power
+    of the operands which may be integers calls the runtime since lua 5.3.
+    Lua 5.1 has no goto, so loops get no continue labels there.
+    """
+    DEFAULT = "5.2"
+
+    TARGETS = {
+        "5.1": dict(_bit_library("bit"), goto=False),
+        "luajit": dict(_bit_library("bit"), goto=True),
+        "5.2": dict(_bit_library("bit32"), goto=True),
+        "5.3": dict(_NATIVE_OPERATORS, goto=True),
+        "5.4": dict(_NATIVE_OPERATORS, goto=True),
+    }
+
+    def __init__(self, name=None):
+        name = self.DEFAULT if name is None else str(name).lower()
+        if name not in self.TARGETS:
+            raise RuntimeError("Unknown lua target '{}', supported targets: {}.".format(
+                name, ", ".join(self.TARGETS)))
+
+        self.name = name
+        self.operations = self.TARGETS[name]
+
+    @property
+    def has_goto(self):
+        """Check the target supports goto and labels"""
+        return self.operations["goto"]
+
+    def get_binary_format(self, operation, default, native=True):
+        """Return the format of the binary operation for the target.
+
+        The runtime function of the operation is used unless the operands
+        are known to suit the native lua operation.
+        """
+        if not native:
+            line = self.operations["dynamic"].get(operation.__class__)
+            if line is not None:
+                return line
+        return self.operations["binary"].get(operation.__class__, default)
+
+    def get_unary_format(self, operation, default):
+        """Return the format of the unary operation for the target"""
+        return self.operations["unary"].get(operation.__class__, default)
@@ -7,25 +7,109 @@ from .cmpopdesc import CompareOperationDesc
 from .nameconstdesc import NameConstantDesc
 from .unaryopdesc import UnaryOperationDesc
 
+from .constantfolder import ConstantFolder
 from .context import Context
 from .loopcounter import LoopCounter
+from .luatarget import LuaTarget
+from .scopeanalyzer import ScopeAnalyzer
+from .symbolscope import SymbolScope
+from .symbolsstack import SymbolsStack
 from .tokenendmode import TokenEndMode
 
 
 class NodeVisitor(ast.NodeVisitor):
     LUACODE = "[[luacode]]"
 
+    COMPREHENSIONS = (ast.ListComp, ast.SetComp, ast.DictComp)
+
+    # Expressions which need no parentheses as a left operand of '-'.
+    SIMPLE_EXPRESSIONS = (ast.Name, ast.Attribute, ast.Subscript, ast.Call,
+                          ast.BinOp)
+
     """Node visitor"""
-    def __init__(self, context=None, config=None):
+    def __init__(self, context=None, config=None, writer=None,
+                 symbol_tables=None, hoister=None):
         self.context = context if context is not None else Context()
         self.config = config
+        self.target = LuaTarget(config["target"] if config is not None else None)
+        self.writer = writer
+        self.symbol_tables = symbol_tables
+        self.hoister = hoister
         self.last_end_mode = TokenEndMode.LINE_FEED
-        self.output = []
+
+        # Inline values are collected in the buffer, every inline visit
+        # pushes a mark and pops its values joined into a single line.
+        self.buffer = []
+        self.inline_depth = 0
+
+        self.visitors = {}
+
+        # Attribute names assigned anywhere in the module, such attributes
+        # can shadow methods of the instances.
+        self.assigned_attributes = set()
+
+        # Names of the python module, temporaries of the translated code
+        # must not shadow them.
+        self.module_names = set()
+
+    def visit_AnnAssign(self, node):
+        """Visit annotated assign"""
+        if node.value is None:
+            # A bare annotation only declares the local variable.
+            if isinstance(node.target, ast.Name) and \
+                    not self.context.last()["class_name"] and \
+                    self.declare_local(node.target.id):
+                self.emit("local {}".format(node.target.id))
+            return
+
+        if self.target.name == "luajit" and \
+                self.is_numeric_list_annotation(node.annotation):
+            if isinstance(node.value, ast.List):
+                elements = [self.visit_all(item, inline=True)
+                            for item in node.value.elts]
+                value = self.use_format("numeric_list {{{}}}").format(
+                    ", ".join(elements))
+            else:
+                value = self.use_format("numeric_list({})").format(
+                    self.visit_all(node.value, inline=True))
+        elif self.is_inlined_comprehension(node.value, node.target):
+            self.emit_comprehension_assignment(node.target, node.value)
+            return
+        else:
+            value = self.visit_all(node.value, inline=True)
+
+        self.emit_assignment(node.target, value)
 
     def visit_Assign(self, node):
         """Visit assign"""
-        target = self.visit_all(node.targets[0], inline=True)
-        value = self.visit_all(node.value, inline=True)
+        if self.is_inlined_comprehension(node.value, node.targets[0]):
+            self.emit_comprehension_assignment(node.targets[0], node.value)
+            return
+
+        self.emit_assignment(node.targets[0],
+                             self.visit_all(node.value, inline=True))
+
+    def emit_comprehension_assignment(self, target_node, node):
+        """Emit the assignment of the comprehension evaluated in a do block"""
+        if not self.context.last()["class_name"]:
+            new_locals = [name for name in self.get_target_names(target_node)
+                          if self.declare_local(name)]
+            if new_locals:
+                self.emit("local {}".format(", ".join(new_locals)))
+
+        self.begin_do_block()
+        self.emit_assignment(target_node, self.emit_comprehension_value(node))
+        self.end_do_block()
+
+    def emit_assignment(self, target_node, value):
+        """Emit the assignment of the translated value to the target"""
+        item = self.get_numeric_list_item(target_node)
+        if item is not None:
+            line = self.use_format("numeric_list_set({}, {}, {})")
+            self.emit(line.format(*item, value))
+            return
+
+        target = self.visit_all(target_node, inline=True)
 
         local_keyword = ""
 
@@ -33,11 +117,14 @@ class NodeVisitor(ast.NodeVisitor):
 
         if last_ctx["class_name"]:
             target = ".".join([last_ctx["class_name"], target])
+        else:
+            names = self.get_target_names(target_node)
+            new_locals = [name for name in names if self.declare_local(name)]
 
-        if "." not in target and not last_ctx["locals"].exists(target):
-            local_keyword = "local "
-            last_ctx["locals"].add_symbol(target)
-
+            if new_locals and len(new_locals) == len(names):
+                local_keyword = "local "
+            elif new_locals:
+                self.emit("local {}".format(", ".join(new_locals)))
 
         self.emit("{local}{target} = {value}".format(local=local_keyword,
                                                      target=target,
@@ -48,20 +135,34 @@ class NodeVisitor(ast.NodeVisitor):
         operation = BinaryOperationDesc.OPERATION[node.op.__class__]
 
         target = self.visit_all(node.target, inline=True)
+        item = self.get_numeric_list_item(node.target)
 
         values = {
             "left": target,
             "right": self.visit_all(node.value, inline=True),
             "operation": operation["value"],
         }
+        if item is not None:
+            values["left"] = self.use_format("numeric_list_get({}, {})").format(*item)
 
-        line = "({})".format(operation["format"])
-        line = line.format(**values)
+        line = self.get_binary_format(node.op, node.target, node.value,
+                                      numbers=item is not None)
+        line = "({})".format(line).format(**values)
+
+        if item is not None:
+            line = self.use_format("numeric_list_set({}, {}, {})").format(*item, line)
+            self.emit(line)
+            return
 
         self.emit("{target} = {line}".format(target=target, line=line))
 
     def visit_Attribute(self, node):
         """Visit attribute"""
+        if isinstance(node.ctx, ast.Load) and isinstance(node.value, ast.Name):
+            # Functions of the lua libraries can be hoisted.
+            self.emit(self.use_global("{}.{}".format(node.value.id, node.attr)))
+            return
+
         line = "{object}.{attr}"
         values = {
             "object": self.visit_all(node.value, True),
@@ -72,13 +173,17 @@ class NodeVisitor(ast.NodeVisitor):
     def visit_BinOp(self, node):
         """Visit binary operation"""
         operation = BinaryOperationDesc.OPERATION[node.op.__class__]
-        line = "({})".format(operation["format"])
+        line = "({})".format(self.get_binary_format(node.op, node.left, node.right))
         values = {
             "left": self.visit_all(node.left, True),
             "right": self.visit_all(node.right, True),
             "operation": operation["value"],
         }
 
+        # '^' binds tighter than the unary operators in lua.
+        if isinstance(node.op, ast.Pow) and not self.is_simple_operand(node.left):
+            values["left"] = "({})".format(values["left"])
+
         self.emit(line.format(**values))
 
     def visit_BoolOp(self, node):
@@ -101,9 +206,15 @@ class NodeVisitor(ast.NodeVisitor):
         """Visit function call"""
         line = "{name}({arguments})"
 
-        name = self.visit_all(node.func, inline=True)
         arguments = [self.visit_all(arg, inline=True) for arg in node.args]
 
+        method_call = self.get_method_call(node.func)
+        if method_call is not None:
+            name, instance = method_call
+            arguments.insert(0, instance)
+        else:
+            name = self.visit_all(node.func, inline=True)
+
         self.emit(line.format(name=name, arguments=", ".join(arguments)))
 
     def visit_ClassDef(self, node):
@@ -112,9 +223,8 @@ class NodeVisitor(ast.NodeVisitor):
 
         local_keyword = ""
         last_ctx = self.context.last()
-        if not last_ctx["class_name"] and not last_ctx["locals"].exists(node.name):
+        if not last_ctx["class_name"] and self.declare_local(node.name):
             local_keyword = "local "
-            last_ctx["locals"].add_symbol(node.name)
 
         name = node.name
         if last_ctx["class_name"]:
@@ -126,13 +236,21 @@ class NodeVisitor(ast.NodeVisitor):
             "node_name": node.name,
         }
 
-        self.emit("{local}{name} = class(function({node_name})".format(**values))
+        line = self.use_format("{local}{name} = class(function({node_name})")
+        self.emit(line.format(**values))
 
-        self.context.push({"class_name": node.name})
-        self.visit_all(node.body)
-        self.context.pop()
+        methods = {item.name for item in node.body
+                   if isinstance(item, ast.FunctionDef) and not item.decorator_list}
 
-        self.output[-1].append("return {node_name}".format(**values))
+        self.context.push({
+            "class_name": node.name,
+            "symbols": self.symbol_tables[node],
+            "self_name": None,
+            "class_methods": frozenset(methods - self.assigned_attributes),
+        })
+        self.visit_body(node.body,
+                        epilogue=["return {node_name}".format(**values)])
+        self.context.pop()
 
         self.emit("end, {{{}}})".format(", ".join(bases)))
 
@@ -162,7 +280,7 @@ class NodeVisitor(ast.NodeVisitor):
                 values["op"] = operation
                 line += "{left} {op} {right}".format(**values)
             elif isinstance(operation, dict):
-                line += operation["format"].format(**values)
+                line += self.use_format(operation["format"]).format(**values)
 
             if i < len(node.ops) - 1:
                 left = right
@@ -172,6 +290,10 @@ class NodeVisitor(ast.NodeVisitor):
 
     def visit_Continue(self, node):
         """Visit continue"""
+        if not self.target.has_goto:
+            raise RuntimeError("The continue statement is not supported "
+                               "by the lua {} target.".format(self.target.name))
+
         last_ctx = self.context.last()
         line = "goto {}".format(last_ctx["loop_label_name"])
         self.emit(line)
@@ -186,53 +308,20 @@ class NodeVisitor(ast.NodeVisitor):
 
     def visit_Dict(self, node):
         """Visit dictionary"""
-        keys = []
-
-        for key in node.keys:
-            value = self.visit_all(key, inline=True)
-            if isinstance(key, ast.Str):
-                value = "[{}]".format(value)
-            keys.append(value)
+        if not node.keys:
+            self.emit(self.use_format("dict {}"))
+            return
 
+        # Keys and values are passed as arrays to keep the insertion order.
+        keys = [self.visit_all(key, inline=True) for key in node.keys]
         values = [self.visit_all(item, inline=True) for item in node.values]
 
-        elements = ["{} = {}".format(keys[i], values[i]) for i in range(len(keys))]
-        elements = ", ".join(elements)
-        self.emit("dict {{{}}}".format(elements))
+        line = self.use_format("dict({{{}}}, {{{}}})")
+        self.emit(line.format(", ".join(keys), ", ".join(values)))
 
     def visit_DictComp(self, node):
         """Visit dictionary comprehension"""
-        self.emit("(function()")
-        self.emit("local result = dict {}")
-
-        ends_count = 0
-
-        for comp in node.generators:
-            line = "for {target} in {iterator} do"
-            values = {
-                "target": self.visit_all(comp.target, inline=True),
-                "iterator": self.visit_all(comp.iter, inline=True),
-            }
-            line = line.format(**values)
-            self.emit(line)
-            ends_count += 1
-
-            for if_ in comp.ifs:
-                line = "if {} then".format(self.visit_all(if_, inline=True))
-                self.emit(line)
-                ends_count += 1
-
-        line = "result[{key}] = {value}"
-        values = {
-            "key": self.visit_all(node.key, inline=True),
-            "value": self.visit_all(node.value, inline=True),
-        }
-        self.emit(line.format(**values))
-
-        self.emit(" ".join(["end"] * ends_count))
-
-        self.emit("return result")
-        self.emit("end)()")
+        self.emit_comprehension_closure(node)
 
     def visit_Ellipsis(self, node):
         """Visit ellipsis"""
@@ -245,11 +334,9 @@ class NodeVisitor(ast.NodeVisitor):
             expr_is_docstring = True
 
         self.context.push({"docstring": expr_is_docstring})
-        output = self.visit_all(node.value)
+        self.visit_all(node.value)
         self.context.pop()
 
-        self.output.append(output)
-
     def visit_FunctionDef(self, node):
         """Visit function definition"""
         line = "{local}function {name}({arguments})"
@@ -267,9 +354,8 @@ class NodeVisitor(ast.NodeVisitor):
 
         local_keyword = ""
 
-        if "." not in name and not last_ctx["locals"].exists(name):
+        if "." not in name and self.declare_local(name):
             local_keyword = "local "
-            last_ctx["locals"].add_symbol(name)
 
         function_def = line.format(local=local_keyword,
                                    name=name,
@@ -277,18 +363,10 @@ class NodeVisitor(ast.NodeVisitor):
 
         self.emit(function_def)
 
-        self.context.push({"class_name": ""})
-        self.visit_all(node.body)
-        self.context.pop()
-
-        body = self.output[-1]
-
-        if node.args.vararg is not None:
-            line = "local {name} = list {{...}}".format(name=node.args.vararg.arg)
-            body.insert(0, line)
+        prologue = []
 
-        arg_index = -1
-        for i in reversed(node.args.defaults):
+        arg_index = -len(node.args.defaults)
+        for i in node.args.defaults:
             line = "{name} = {name} or {value}"
 
             arg = node.args.args[arg_index]
@@ -296,9 +374,40 @@ class NodeVisitor(ast.NodeVisitor):
                 "name": arg.arg,
                 "value": self.visit_all(i, inline=True),
             }
-            body.insert(0, line.format(**values))
+            prologue.append(line.format(**values))
 
-            arg_index -= 1
+            arg_index += 1
+
+        if node.args.vararg is not None:
+            line = self.use_format("local {name} = list_of {{...}}")
+            line = line.format(name=node.args.vararg.arg)
+            prologue.append(line)
+
+        # Function locals are tracked from scratch, the parameters are
+        # already declared.
+        function_locals = SymbolsStack()
+        for arg in node.args.args:
+            function_locals.add_symbol(arg.arg)
+        if node.args.vararg is not None:
+            function_locals.add_symbol(node.args.vararg.arg)
+
+        # Methods of the instance are called directly through its class
+        # unless the first argument of the method is rebound.
+        symbols = self.symbol_tables[node]
+        self_name = None
+        if last_ctx["class_name"] and not node.decorator_list and node.args.args:
+            self_name = node.args.args[0].arg
+            if self_name in symbols.assigned:
+                self_name = None
+
+        self.context.push({
+            "class_name": "",
+            "symbols": symbols,
+            "locals": function_locals,
+            "self_name": self_name,
+        })
+        self.visit_body(node.body, prologue=prologue)
+        self.context.pop()
 
         self.emit("end")
 
@@ -313,31 +422,44 @@ class NodeVisitor(ast.NodeVisitor):
 
     def visit_For(self, node):
         """Visit for loop"""
-        line = "for {target} in {iter} do"
-
-        values = {
-            "target": self.visit_all(node.target, inline=True),
-            "iter": self.visit_all(node.iter, inline=True),
-        }
-
-        self.emit(line.format(**values))
+        symbols = self.context.last()["symbols"]
+        inlined = self.is_inlined_comprehension(node.iter, node.target)
+
+        prologue = []
+        if not inlined:
+            self.emit(self.get_for_header(node.target, node.iter, symbols))
+        elif isinstance(node.iter, ast.ListComp):
+            # The items are read from the filled table by their indices.
+            self.begin_do_block()
+            result, size, index = self.get_temporary_names(
+                ["result", "size", "index"], node.target.id)
+            self.emit("local {}, {} = {{}}, 0".format(result, size))
+            self.emit_comprehension(node.iter, result, size)
+            self.emit("for {} = 1, {} do".format(index, size))
+            prologue.append("local {} = {}[{}]".format(node.target.id, result, index))
+        else:
+            self.begin_do_block()
+            value = self.emit_comprehension_value(node.iter)
+            self.emit(self.get_iterate_header(node.target, value, symbols))
 
         continue_label = LoopCounter.get_next()
         self.context.push({
             "loop_label_name": continue_label,
         })
-        self.visit_all(node.body)
+        self.visit_body(node.body,
+                        prologue=prologue,
+                        declared=self.get_target_names(node.target),
+                        epilogue=self.get_loop_epilogue(continue_label))
         self.context.pop()
 
-        self.output[-1].append("::{}::".format(continue_label))
-
         self.emit("end")
 
+        if inlined:
+            self.end_do_block()
+
     def visit_Global(self, node):
-        """Visit globals"""
-        last_ctx = self.context.last()
-        for name in node.names:
-            last_ctx["globals"].add_symbol(name)
+        """Visit globals, they are resolved by the scope analysis"""
+        pass
 
     def visit_If(self, node):
         """Visit if"""
@@ -346,6 +468,12 @@ class NodeVisitor(ast.NodeVisitor):
         line = "if {} then".format(test)
 
         self.emit(line)
+        self.visit_if_branches(node)
+
+        self.emit("end")
+
+    def visit_if_branches(self, node):
+        """Visit if body and all elseif/else branches"""
         self.visit_all(node.body)
 
         if node.orelse:
@@ -354,19 +482,15 @@ class NodeVisitor(ast.NodeVisitor):
                 elseif_test = self.visit_all(elseif.test, inline=True)
 
                 line = "elseif {} then".format(elseif_test)
+                position = self.set_position(elseif)
                 self.emit(line)
 
-                output_length = len(self.output)
-                self.visit_If(node.orelse[0])
-
-                del self.output[output_length]
-                del self.output[-1]
+                self.visit_if_branches(elseif)
+                self.writer.position = position
             else:
                 self.emit("else")
                 self.visit_all(node.orelse)
 
-        self.emit("end")
-
     def visit_IfExp(self, node):
         """Visit if expression"""
         line = "{cond} and {true_cond} or {false_cond}"
@@ -391,6 +515,8 @@ class NodeVisitor(ast.NodeVisitor):
             values["asname"] = node.names[0].asname
             values["name"] = node.names[0].name
 
+        self.context.last()["locals"].add_symbol(values["asname"])
+
         self.emit(line.format(**values))
 
     def visit_Index(self, node):
@@ -405,58 +531,55 @@ class NodeVisitor(ast.NodeVisitor):
 
         function_def = line.format(arguments=", ".join(arguments))
 
+        self_name = self.context.last()["self_name"]
+        self.context.push({
+            "self_name": None if self_name in arguments else self_name,
+        })
+
         output = []
         output.append(function_def)
         output.append(self.visit_all(node.body, inline=True))
         output.append("end")
 
+        self.context.pop()
+
         self.emit(" ".join(output))
 
     def visit_List(self, node):
         """Visit list"""
         elements = [self.visit_all(item, inline=True) for item in node.elts]
-        line = "list {{{}}}".format(", ".join(elements))
+        line = self.use_format("list_of {{{}}}").format(", ".join(elements))
         self.emit(line)
 
     def visit_ListComp(self, node):
         """Visit list comprehension"""
-        self.emit("(function()")
-        self.emit("local result = list {}")
+        self.emit_comprehension_closure(node)
 
-        ends_count = 0
+    def visit_Module(self, node):
+        """Visit module"""
+        if self.symbol_tables is None:
+            self.symbol_tables = ScopeAnalyzer().analyze(node)
 
-        for comp in node.generators:
-            line = "for {target} in {iterator} do"
-            values = {
-                "target": self.visit_all(comp.target, inline=True),
-                "iterator": self.visit_all(comp.iter, inline=True),
-            }
-            line = line.format(**values)
-            self.emit(line)
-            ends_count += 1
+        for table in self.symbol_tables.values():
+            self.assigned_attributes.update(table.attributes)
+            self.module_names.update(table.parameters, table.assigned,
+                                     table.referenced)
 
-            for if_ in comp.ifs:
-                line = "if {} then".format(self.visit_all(if_, inline=True))
-                self.emit(line)
-                ends_count += 1
-
-        line = "result.append({})"
-        line = line.format(self.visit_all(node.elt, inline=True))
-        self.emit(line)
+        self.context.push({"symbols": self.symbol_tables[node]})
 
-        self.emit(" ".join(["end"] * ends_count))
+        for statement in node.body:
+            self.set_position(statement)
+            self.visit(statement)
 
-        self.emit("return result")
-        self.emit("end)()")
+        self.context.pop()
 
-    def visit_Module(self, node):
-        """Visit module"""
-        self.visit_all(node.body)
-        self.output = self.output[0]
+    def visit_Nonlocal(self, node):
+        """Visit nonlocals, they are resolved by the scope analysis"""
+        pass
 
     def visit_Name(self, node):
         """Visit name"""
-        self.emit(node.id)
+        self.emit(self.use_global(node.id))
 
     def visit_NameConstant(self, node):
         """Visit name constant"""
@@ -472,14 +595,30 @@ class NodeVisitor(ast.NodeVisitor):
 
     def visit_Return(self, node):
         """Visit return"""
+        if self.is_inlined_comprehension(node.value):
+            self.begin_do_block()
+            self.emit("return {}".format(self.emit_comprehension_value(node.value)))
+            self.end_do_block()
+            return
+
         line = "return "
         line += self.visit_all(node.value, inline=True)
         self.emit(line)
 
+    def visit_Set(self, node):
+        """Visit set"""
+        elements = [self.visit_all(item, inline=True) for item in node.elts]
+        line = self.use_format("set {{{}}}").format(", ".join(elements))
+        self.emit(line)
+
+    def visit_SetComp(self, node):
+        """Visit set comprehension"""
+        self.emit_comprehension_closure(node)
+
     def visit_Starred(self, node):
         """Visit starred object"""
         value = self.visit_all(node.value, inline=True)
-        line = "unpack({})".format(value)
+        line = self.use_format("unpack({})").format(value)
         self.emit(line)
 
     def visit_Str(self, node):
@@ -496,6 +635,9 @@ class NodeVisitor(ast.NodeVisitor):
     def visit_Subscript(self, node):
         """Visit subscript"""
         line = "{name}[{index}]"
+        if isinstance(node.ctx, ast.Load) and \
+                self.get_numeric_list_item(node) is not None:
+            line = self.use_format("numeric_list_get({name}, {index})")
         values = {
             "name": self.visit_all(node.value, inline=True),
             "index": self.visit_all(node.slice, inline=True),
@@ -513,7 +655,8 @@ class NodeVisitor(ast.NodeVisitor):
         operation = UnaryOperationDesc.OPERATION[node.op.__class__]
         value = self.visit_all(node.operand, inline=True)
 
-        line = operation["format"]
+        line = self.use_format(self.target.get_unary_format(node.op,
+                                                            operation["format"]))
         values = {
             "value": value,
             "operation": operation["value"],
@@ -531,32 +674,29 @@ class NodeVisitor(ast.NodeVisitor):
         self.context.push({
             "loop_label_name": continue_label,
         })
-        self.visit_all(node.body)
+        self.visit_body(node.body,
+                        epilogue=self.get_loop_epilogue(continue_label))
         self.context.pop()
 
-        self.output[-1].append("::{}::".format(continue_label))
-
         self.emit("end")
 
     def visit_With(self, node):
         """Visit with"""
         self.emit("do")
 
-        self.visit_all(node.body)
-
-        body = self.output[-1]
         lines = []
+        declared = []
         for i in node.items:
             line = ""
             if i.optional_vars is not None:
                 line = "local {} = "
                 line = line.format(self.visit_all(i.optional_vars,
                                                   inline=True))
+                declared.extend(self.get_target_names(i.optional_vars))
             line += self.visit_all(i.context_expr, inline=True)
             lines.append(line)
 
-        for line in lines:
-            body.insert(0, line)
+        self.visit_body(node.body, prologue=reversed(lines), declared=declared)
 
         self.emit("end")
 
@@ -564,32 +704,425 @@ class NodeVisitor(ast.NodeVisitor):
         """Unknown nodes handler"""
         raise RuntimeError("Unknown node: {}".format(node))
 
+    def visit(self, node):
+        """Visit a node, the visit method is cached for the node class"""
+        visitor = self.visitors.get(node.__class__)
+        if visitor is None:
+            method = "visit_" + node.__class__.__name__
+            visitor = getattr(self, method, self.generic_visit)
+            self.visitors[node.__class__] = visitor
+        return visitor(node)
+
+    @staticmethod
+    def is_numeric_list_annotation(annotation):
+        """Check the annotation is List[int] or List[float]"""
+        if not isinstance(annotation, ast.Subscript):
+            return False
+
+        container = annotation.value
+        if isinstance(container, ast.Attribute):
+            container_name = container.attr
+        elif isinstance(container, ast.Name):
+            container_name = container.id
+        else:
+            return False
+
+        element = annotation.slice
+        if isinstance(element, ast.Index):
+            element = element.value
+
+        return container_name in ("List", "list") and \
+            isinstance(element, ast.Name) and element.id in ("int", "float")
+
+    def use_global(self, name):
+        """Return the name to write in place of the global name"""
+        if self.hoister is None:
+            return name
+        return self.hoister.use(name)
+
+    def use_format(self, line):
+        """Return the format string with the names of the hoisted globals"""
+        if self.hoister is None:
+            return line
+        return self.hoister.use_format(line)
+
+    def get_numeric_list_item(self, node):
+        """Return the list and the index of the numeric list item or None.
+
+        Names annotated as numeric lists are indexed by the runtime
+        functions on LuaJIT, this avoids the __index metamethod.
+        """
+        if self.target.name != "luajit" or not isinstance(node, ast.Subscript):
+            return None
+        if isinstance(node.slice, ast.Slice) or not isinstance(node.value, ast.Name):
+            return None
+
+        name = node.value.id
+        if not self.is_numeric_list_annotation(self.get_annotation(name)):
+            return None
+
+        return name, self.visit_all(node.slice, inline=True)
+
+    def get_annotation(self, name):
+        """Return the annotation of the name in the scope binding it or None"""
+        table = self.context.last()["symbols"]
+        while table is not None and not table.binds(name):
+            table = table.parent
+        return table.annotations.get(name) if table is not None else None
+
+    def get_loop_epilogue(self, continue_label):
+        """Return the lines closing the loop body, the continue label"""
+        if not self.target.has_goto:
+            return []
+        return ["::{}::".format(continue_label)]
+
+    def get_binary_format(self, operation, left, right, numbers=False):
+        """Return the format of the binary operation of the operand nodes.
+
+        The native lua operator suits the bitwise operations of numbers and
+        the power with a float operand or a negative exponent.
+        """
+        if isinstance(operation, ast.Pow):
+            native = self.is_float_operand(left) or self.is_float_operand(right) or \
+                self.is_negative_constant(right)
+        else:
+            native = numbers or self.is_number_operand(left) or \
+                self.is_number_operand(right)
+        default = BinaryOperationDesc.OPERATION[operation.__class__]["format"]
+        return self.use_format(self.target.get_binary_format(operation, default,
+                                                             native=native))
+
+    def is_float_operand(self, node):
+        """Check the operand is a literal, annotated or divided float"""
+        value = ConstantFolder.get_constant(node)
+        if isinstance(value, float):
+            return True
+        if isinstance(node, ast.Name):
+            annotation = self.get_annotation(node.id)
+            return isinstance(annotation, ast.Name) and annotation.id == "float"
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.UAdd, ast.USub)):
+            return self.is_float_operand(node.operand)
+        return isinstance(node, ast.BinOp) and isinstance(node.op, ast.Div)
+
+    @staticmethod
+    def is_negative_constant(node):
+        """Check the operand is a negative number literal"""
+        value = ConstantFolder.get_constant(node)
+        return isinstance(value, (int, float)) and not isinstance(value, bool) and value < 0
+
+    def is_number_operand(self, node):
+        """Check the operand is a literal or annotated number"""
+        value = ConstantFolder.get_constant(node)
+        if isinstance(value, (int, float)):
+            return True
+        if isinstance(node, ast.Name):
+            annotation = self.get_annotation(node.id)
+            return isinstance(annotation, ast.Name) and annotation.id in ("int", "float")
+        if isinstance(node, ast.Subscript) and isinstance(node.value, ast.Name):
+            return not isinstance(node.slice, ast.Slice) and \
+                self.is_numeric_list_annotation(self.get_annotation(node.value.id))
+        if isinstance(node, ast.UnaryOp):
+            return isinstance(node.op, ast.Invert) or self.is_number_operand(node.operand)
+        if isinstance(node, ast.BinOp):
+            if isinstance(node.op, (ast.LShift, ast.RShift)):
+                return True
+            if isinstance(node.op, (ast.BitOr, ast.BitAnd, ast.BitXor)):
+                return self.is_number_operand(node.left) or \
+                    self.is_number_operand(node.right)
+        return False
+
+    @staticmethod
+    def is_simple_operand(node):
+        """Check the operand is written without a leading unary operator"""
+        value = ConstantFolder.get_constant(node)
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            return value >= 0
+        return not isinstance(node, ast.UnaryOp)
+
+    def get_for_header(self, target, iterator, symbols):
+        """Return the header of the for loop over the iterator"""
+        numeric_range = self.get_numeric_range(target, iterator, symbols)
+        if numeric_range is not None:
+            return "for {} do".format(numeric_range)
+
+        return self.get_iterate_header(target, self.visit_all(iterator, inline=True),
+                                       symbols)
+
+    def get_iterate_header(self, target, iterator, symbols):
+        """Return the header of the for loop over the translated iterator"""
+        values = {
+            "target": self.visit_all(target, inline=True),
+            "iter": iterator,
+        }
+
+        # A single value is iterated with the stateless iterator of the runtime.
+        if isinstance(target, ast.Name):
+            values["control"] = self.get_unused_name(symbols, "_", target.id)
+            line = self.use_format("for {control}, {target} in iterate({iter}) do")
+            return line.format(**values)
+
+        return "for {target} in {iter} do".format(**values)
+
+    @staticmethod
+    def get_unused_name(symbols, name, *reserved):
+        """Return the name which is not used in the scope of the symbols"""
+        used = set(reserved)
+        if symbols is not None:
+            used.update(symbols.parameters, symbols.assigned, symbols.referenced)
+
+        while name in used:
+            name += "_"
+        return name
+
+    def get_numeric_range(self, target, iterator, symbols):
+        """Return the numeric for loop bounds of the range call or None"""
+        if not isinstance(target, ast.Name) or not isinstance(iterator, ast.Call):
+            return None
+        if not isinstance(iterator.func, ast.Name) or iterator.func.id != "range":
+            return None
+
+        args = iterator.args
+        if iterator.keywords or not 1 <= len(args) <= 3:
+            return None
+        if any(isinstance(arg, ast.Starred) for arg in args):
+            return None
+
+        # The range function can be shadowed by a python variable.
+        if symbols is None or \
+                symbols.get_scope("range") != SymbolScope.GLOBAL_IMPLICIT:
+            return None
+
+        # The direction of the loop must be known at the translation time.
+        step = 1
+        if len(args) == 3:
+            step = ConstantFolder.get_constant(args[2])
+            if not isinstance(step, int) or isinstance(step, bool) or step == 0:
+                return None
+
+        if len(args) == 1:
+            start, stop = "0", args[0]
+        else:
+            start, stop = self.visit_all(args[0], inline=True), args[1]
+
+        # Python range excludes the stop value, lua numeric for includes it.
+        offset = -1 if step > 0 else 1
+        stop_value = ConstantFolder.get_constant(stop)
+        if isinstance(stop_value, int) and not isinstance(stop_value, bool):
+            end = str(stop_value + offset)
+        else:
+            end = self.visit_all(stop, inline=True)
+            if not isinstance(stop, self.SIMPLE_EXPRESSIONS):
+                end = "({})".format(end)
+            end = "{} {} 1".format(end, "-" if offset < 0 else "+")
+
+        bounds = [start, end]
+        if step != 1:
+            bounds.append(str(step))
+        return "{} = {}".format(target.id, ", ".join(bounds))
+
+    def get_method_call(self, func):
+        """Return the method and the instance of a direct method call or None.
+
+        Calls of the methods defined in the class body on the first
+        argument of the method are dispatched through the class of the
+        instance, so no bound method is created.
+        """
+        if not isinstance(func, ast.Attribute) or not isinstance(func.value, ast.Name):
+            return None
+
+        last_ctx = self.context.last()
+        self_name = last_ctx["self_name"]
+        if self_name is None or func.value.id != self_name:
+            return None
+        if func.attr not in last_ctx["class_methods"]:
+            return None
+
+        return "{}.__class__.{}".format(self_name, func.attr), self_name
+
+    def is_inlined_comprehension(self, node, target=None):
+        """Check the comprehension can be evaluated by the statements in place.
+
+        Comprehensions assigned to a name, an attribute or an item, returned
+        or iterated by a for loop over a single name need no closure.
+        """
+        if not isinstance(node, self.COMPREHENSIONS) or self.inline_depth:
+            return False
+        if target is None:
+            return True
+        return isinstance(target, (ast.Name, ast.Attribute, ast.Subscript))
+
+    def get_temporary_names(self, names, *reserved):
+        """Return the names of lua temporaries which shadow no python names"""
+        result = []
+        for name in names:
+            while name in self.module_names or name in reserved or name in result:
+                name += "_"
+            result.append(name)
+        return result
+
+    def begin_do_block(self):
+        """Begin the do block keeping the temporaries of a statement local"""
+        self.emit("do")
+        self.context.last()["locals"].push()
+        self.writer.begin_block()
+
+    def end_do_block(self):
+        """End the do block"""
+        self.writer.end_block()
+        self.context.last()["locals"].pop()
+        self.emit("end")
+
+    def emit_comprehension_closure(self, node):
+        """Emit the comprehension as the immediately called function"""
+        self.emit("(function()")
+        self.emit("return {}".format(self.emit_comprehension_value(node)))
+        self.emit("end)()")
+
+    def emit_comprehension_value(self, node):
+        """Emit the statements evaluating the comprehension, return its value.
+
+        Elements of list and set comprehensions are stored into a plain
+        table adopted by the constructor, dict comprehensions keep the
+        insertion order of the dict.
+        """
+        result, size = self.get_temporary_names(["result", "size"])
+        if isinstance(node, ast.DictComp):
+            self.emit(self.use_format("local {} = dict {{}}").format(result))
+            self.emit_comprehension(node, result)
+            return result
+
+        self.emit("local {}, {} = {{}}, 0".format(result, size))
+        self.emit_comprehension(node, result, size)
+
+        constructor = "list_of({})" if isinstance(node, ast.ListComp) else "set({})"
+        return self.use_format(constructor).format(result)
+
+    def emit_comprehension(self, node, result, size=None):
+        """Emit the loops of the comprehension storing the values into the result"""
+        # Statements are indented unless the closure is written inline.
+        indented = not self.inline_depth
+        symbols = self.get_comprehension_symbols(node)
+
+        ends_count = 0
+        for comp in node.generators:
+            self.emit(self.get_for_header(comp.target, comp.iter, symbols))
+            ends_count += 1
+            if indented:
+                self.writer.begin_block()
+
+            for if_ in comp.ifs:
+                self.emit("if {} then".format(self.visit_all(if_, inline=True)))
+                ends_count += 1
+                if indented:
+                    self.writer.begin_block()
+
+        if isinstance(node, ast.DictComp):
+            self.emit("{}[{}] = {}".format(result,
+                                           self.visit_all(node.key, inline=True),
+                                           self.visit_all(node.value, inline=True)))
+        else:
+            self.emit("{size} = {size} + 1".format(size=size))
+            self.emit("{}[{}] = {}".format(result, size,
+                                           self.visit_all(node.elt, inline=True)))
+
+        if not indented:
+            self.emit(" ".join(["end"] * ends_count))
+            return
+
+        for _ in range(ends_count):
+            self.writer.end_block()
+            self.emit("end")
+
+    def get_comprehension_symbols(self, node):
+        """Return the symbol table of the comprehension scope"""
+        if self.symbol_tables is not None and node in self.symbol_tables:
+            return self.symbol_tables[node]
+        return self.context.last()["symbols"]
+
     def visit_all(self, nodes, inline=False):
         """Visit all nodes in the given list"""
-
         if not inline:
-            last_ctx = self.context.last()
-            last_ctx["locals"].push()
+            if isinstance(nodes, list):
+                self.visit_body(nodes)
+            else:
+                self.visit(nodes)
+            return None
 
-        visitor = NodeVisitor(context=self.context, config=self.config)
+        mark = len(self.buffer)
+        self.inline_depth += 1
 
         if isinstance(nodes, list):
             for node in nodes:
-                visitor.visit(node)
-            if not inline:
-                self.output.append(visitor.output)
+                self.visit(node)
         else:
-            visitor.visit(nodes)
-            if not inline:
-                self.output.extend(visitor.output)
+            self.visit(nodes)
 
-        if not inline:
-            last_ctx = self.context.last()
-            last_ctx["locals"].pop()
+        self.inline_depth -= 1
+
+        if len(self.buffer) == mark + 1:
+            return self.buffer.pop()
+
+        line = " ".join(self.buffer[mark:])
+        del self.buffer[mark:]
+        return line
+
+    def visit_body(self, nodes, prologue=(), epilogue=(), declared=()):
+        """Visit all nodes as an indented block of statements"""
+        last_ctx = self.context.last()
+        last_ctx["locals"].push()
+        for name in declared:
+            last_ctx["locals"].add_symbol(name)
+
+        self.writer.begin_block()
+
+        for line in prologue:
+            self.emit(line)
+
+        position = self.writer.position
+        for node in nodes:
+            self.set_position(node)
+            self.visit(node)
+        self.writer.position = position
+
+        for line in epilogue:
+            self.emit(line)
+
+        self.writer.end_block()
 
-        if inline:
-            return " ".join(visitor.output)
+        last_ctx["locals"].pop()
+
+    def set_position(self, node):
+        """Set the python position of the lines emitted for the statement.
+
+        Returns the previous position, the lines closing a block belong
+        to the statement which opened it.
+        """
+        position = self.writer.position
+        self.writer.position = (node.lineno, node.col_offset)
+        return position
+
+    def declare_local(self, name):
+        """Declare the name if it needs a new lua local in the current block"""
+        last_ctx = self.context.last()
+        if not last_ctx["symbols"].is_local(name) or last_ctx["locals"].exists(name):
+            return False
+
+        last_ctx["locals"].add_symbol(name)
+        return True
+
+    @staticmethod
+    def get_target_names(target):
+        """Return names of a simple assignment target"""
+        if isinstance(target, ast.Name):
+            return [target.id]
+        if isinstance(target, ast.Tuple) and all(isinstance(item, ast.Name)
+                                                 for item in target.elts):
+            return [item.id for item in target.elts]
+        return []
 
     def emit(self, value):
         """Add translated value to the output"""
-        self.output.append(value)
+        if self.inline_depth:
+            self.buffer.append(value)
+        else:
+            self.writer.write_line(value)
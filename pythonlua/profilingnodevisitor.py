@@ -0,0 +1,73 @@
+"""Node visitor collecting the translation profile"""
+import sys
+import time
+
+from .nodevisitor import NodeVisitor
+
+
+class ProfilingNodeVisitor(NodeVisitor):
+    """Node visitor which records calls, time and emitted bytes per visit method.
+
+    The total time of a method includes the nested visits and is counted
+    once for recursive calls, the own time excludes the nested visits.
+    Emitted bytes are the bytes passed to emit by the method, inline values
+    are counted again by the enclosing node which emits them as a part of
+    its line.
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = {}
+        self.names = {}
+        self.active = {}
+        self.frames = []
+
+    def visit(self, node):
+        """Visit a node recording the statistics of the visit method"""
+        name = self.names.get(node.__class__)
+        if name is None:
+            name = "visit_" + node.__class__.__name__
+            if not hasattr(self, name):
+                name = "generic_visit"
+            self.names[node.__class__] = name
+            self.stats.setdefault(name, {"calls": 0, "total": 0.0,
+                                         "own": 0.0, "bytes": 0})
+
+        stats = self.stats[name]
+        stats["calls"] += 1
+        self.active[name] = self.active.get(name, 0) + 1
+
+        frame = [name, 0.0]
+        self.frames.append(frame)
+        start = time.perf_counter()
+        try:
+            return super().visit(node)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.frames.pop()
+            if self.frames:
+                self.frames[-1][1] += elapsed
+
+            stats["own"] += elapsed - frame[1]
+            self.active[name] -= 1
+            if not self.active[name]:
+                stats["total"] += elapsed
+
+    def emit(self, value):
+        """Add translated value to the output counting the emitted bytes"""
+        if self.frames:
+            self.stats[self.frames[-1][0]]["bytes"] += len(value)
+        super().emit(value)
+
+    def print_report(self, file=sys.stderr, sort_by="total"):
+        """Print the statistics sorted by the given column"""
+        rows = sorted(self.stats.items(),
+                      key=lambda item: item[1][sort_by], reverse=True)
+
+        print("{:<24}{:>10}{:>14}{:>14}{:>14}{:>12}".format(
+            "method", "calls", "total (ms)", "own (ms)", "per call (us)",
+            "bytes"), file=file)
+        for name, stats in rows:
+            print("{:<24}{:>10}{:>14.2f}{:>14.2f}{:>14.2f}{:>12}".format(
+                name, stats["calls"], stats["total"] * 1000,
+                stats["own"] * 1000, stats["own"] * 1000000 / stats["calls"],
+                stats["bytes"]), file=file)
@@ -0,0 +1,286 @@
+"""Translate a whole python source tree in parallel"""
+from concurrent.futures import ProcessPoolExecutor
+import glob
+import json
+import os
+import subprocess
+import tempfile
+import time
+
+from . import __version__
+from .runtimebuilder import RuntimeBuilder
+from .sourcemap import SourceMap
+from .translationcache import TranslationCache
+from .translator import Translator
+
+
+_CACHES = {}
+
+
+def _get_cache(cache_dir):
+    """Return the translation cache of the current worker process"""
+    if cache_dir is None:
+        return None
+    if cache_dir not in _CACHES:
+        _CACHES[cache_dir] = TranslationCache(cache_dir)
+    return _CACHES[cache_dir]
+
+
+def _translate_file(task):
+    """Translate a single file, this function runs in a worker process"""
+    input_filename, output_filename, config, cache_dir, prologue, source_map = task
+
+    start = time.perf_counter()
+    try:
+        with open(input_filename, "r") as file:
+            content = file.read()
+
+        translator = Translator(config, cache=_get_cache(cache_dir),
+                                source_map=source_map)
+
+        # The output is replaced only by a complete translation, a failed
+        # one leaves no output which would look up to date on the next run.
+        os.makedirs(os.path.dirname(output_filename) or ".", exist_ok=True)
+        tmp_filename = "{}.{}.tmp".format(output_filename, os.getpid())
+        try:
+            with open(tmp_filename, "w") as file:
+                if prologue:
+                    file.write(prologue + "\n")
+                translator.translate_to_stream(content, file)
+                file.write("\n")
+            os.replace(tmp_filename, output_filename)
+        except BaseException:
+            if os.path.exists(tmp_filename):
+                os.remove(tmp_filename)
+            raise
+
+        if source_map:
+            lua_map = SourceMap(input_filename, output_filename,
+                                translator.positions, translator.functions)
+            if prologue:
+                lua_map.shift(1)
+            lua_map.save(SourceMap.get_filename(output_filename))
+    except Exception as ex:  # pylint: disable=broad-except
+        return input_filename, time.perf_counter() - start, str(ex)
+
+    return input_filename, time.perf_counter() - start, None
+
+
+class ProjectTranslator:
+    """Translate all python files of a directory or a glob pattern"""
+    # Every translated file requires the shared lua init code by this name
+    # unless another runtime module is given.
+    RUNTIME_MODULE = "luainit"
+
+    # Written into the output directory, the outputs of other translator
+    # versions, configs or options are translated again.
+    STAMP_FILENAME = ".pythonlua.stamp"
+
+    def __init__(self, config, output_dir, jobs=None, cache_dir=None,
+                 force=False, lua_init=True, minimal_lua_init=False,
+                 runtime_module=None, precompile=False, luac="luac",
+                 source_maps=False, lua_profile=False, lua_allocations=False):
+        self.config = config
+        self.output_dir = output_dir
+        self.jobs = jobs if jobs else os.cpu_count() or 1
+        self.cache_dir = cache_dir
+        self.force = force
+        self.lua_init = lua_init
+        self.minimal_lua_init = minimal_lua_init
+        self.runtime_module = runtime_module if runtime_module is not None \
+            else self.RUNTIME_MODULE
+        self.precompile = precompile
+        self.luac = luac
+        self.source_maps = source_maps
+        self.lua_profile = lua_profile
+        self.lua_allocations = lua_allocations
+
+    @staticmethod
+    def is_project(path):
+        """Check the path is a directory or a glob pattern"""
+        return os.path.isdir(path) or glob.has_magic(path)
+
+    @staticmethod
+    def find_sources(path):
+        """Return the root folder and all python files for the path"""
+        if os.path.isdir(path):
+            sources = []
+            for folder, dirnames, filenames in os.walk(path):
+                dirnames[:] = sorted(name for name in dirnames
+                                     if name != "__pycache__")
+                sources.extend(os.path.join(folder, name)
+                               for name in sorted(filenames)
+                               if name.endswith(".py"))
+            return path, sources
+
+        root_parts = []
+        for part in path.split(os.sep):
+            if glob.has_magic(part):
+                break
+            root_parts.append(part)
+        root = os.sep.join(root_parts) or "."
+
+        sources = sorted(name for name in glob.glob(path, recursive=True)
+                         if os.path.isfile(name))
+        return root, sources
+
+    def get_output_filename(self, root, input_filename):
+        """Return the output path of the lua file for the given source"""
+        relative = os.path.relpath(input_filename, root)
+        return os.path.join(self.output_dir,
+                            os.path.splitext(relative)[0] + ".lua")
+
+    def is_up_to_date(self, input_filename, output_filename):
+        """Check the output file is newer than the source file"""
+        if self.force or not os.path.isfile(output_filename):
+            return False
+        return os.path.getmtime(output_filename) >= os.path.getmtime(input_filename)
+
+    def make_stamp(self):
+        """Return the stamp of the translator and the options of the outputs"""
+        return json.dumps({
+            "version": __version__,
+            "fingerprint": TranslationCache.get_fingerprint(),
+            "config": self.config.data,
+            "lua_init": self.lua_init,
+            "minimal_lua_init": self.minimal_lua_init,
+            "runtime_module": self.runtime_module,
+            "source_maps": self.source_maps,
+            "lua_profile": self.lua_profile,
+            "lua_allocations": self.lua_allocations,
+        }, sort_keys=True, default=str)
+
+    def get_stamp_filename(self):
+        """Return the path to the stamp of the outputs"""
+        return os.path.join(self.output_dir, self.STAMP_FILENAME)
+
+    def read_stamp(self):
+        """Return the stamp of the existing outputs or None"""
+        try:
+            with open(self.get_stamp_filename(), "r") as file:
+                return file.read()
+        except FileNotFoundError:
+            return None
+
+    @staticmethod
+    def make_require(runtime_module):
+        """Return the lua statement loading the runtime module"""
+        return "require(\"{}\")".format(runtime_module)
+
+    def get_runtime_filename(self):
+        """Return the path to the shared lua initialization code"""
+        return os.path.join(self.output_dir,
+                            *self.runtime_module.split(".")) + ".lua"
+
+    def compile_runtime(self, runtime, runtime_filename):
+        """Write the lua initialization code compiled to bytecode with luac"""
+        file_desc, source_filename = tempfile.mkstemp(suffix=".lua")
+        try:
+            with os.fdopen(file_desc, "w") as file:
+                file.write(runtime)
+            subprocess.run([self.luac, "-o", runtime_filename, source_filename],
+                           check=True, stdout=subprocess.PIPE,
+                           stderr=subprocess.PIPE)
+        except FileNotFoundError:
+            raise RuntimeError("The lua compiler ('{}') is not found.".format(self.luac))
+        except subprocess.CalledProcessError as ex:
+            raise RuntimeError("The lua compiler failed: {}".format(
+                ex.stderr.decode("utf-8", "replace").strip()))
+        finally:
+            os.remove(source_filename)
+
+    def write_runtime(self, output_filenames=None):
+        """Write the shared lua initialization code once.
+
+        If the output filenames are given only the definitions used
+        by these files are written.
+        """
+        runtime = Translator.get_luainit()
+        if output_filenames is not None:
+            builder = RuntimeBuilder(runtime)
+            names = set()
+            for output_filename in output_filenames:
+                if os.path.isfile(output_filename):
+                    with open(output_filename, "r") as file:
+                        names.update(builder.find_references(file.read()))
+            runtime = builder.build_for_names(names)
+
+        if self.lua_profile:
+            runtime = Translator.get_lua_profiler() + "\n" + runtime
+        if self.lua_allocations:
+            runtime = runtime + "\n" + Translator.get_lua_allocations()
+
+        runtime_filename = self.get_runtime_filename()
+        os.makedirs(os.path.dirname(runtime_filename), exist_ok=True)
+        if self.precompile:
+            self.compile_runtime(runtime, runtime_filename)
+            return
+
+        with open(runtime_filename, "w") as file:
+            file.write(runtime)
+
+    def translate(self, path, report=print):
+        """Translate all python files, return the number of failed files"""
+        if (self.lua_profile or self.lua_allocations) and not self.lua_init:
+            raise RuntimeError("The lua profiler and the allocation tracking are "
+                               "installed by the lua init code of the project.")
+
+        root, sources = self.find_sources(path)
+        output_filenames = [self.get_output_filename(root, input_filename)
+                            for input_filename in sources]
+
+        if self.lua_init:
+            runtime_filename = os.path.normpath(self.get_runtime_filename())
+            for input_filename, output_filename in zip(sources, output_filenames):
+                if os.path.normpath(output_filename) == runtime_filename:
+                    raise RuntimeError("The source file '{}' would overwrite the runtime "
+                                       "module '{}'.".format(input_filename, runtime_filename))
+
+        os.makedirs(self.output_dir, exist_ok=True)
+
+        # The stamp is removed until the run ends, the outputs of an
+        # interrupted run are not taken for the outputs of the new options.
+        stamp = self.make_stamp()
+        stale = self.read_stamp() != stamp
+        if stale and os.path.isfile(self.get_stamp_filename()):
+            os.remove(self.get_stamp_filename())
+
+        if self.lua_init and not self.minimal_lua_init:
+            self.write_runtime()
+
+        prologue = None
+        if self.lua_init:
+            prologue = self.make_require(self.runtime_module)
+
+        tasks = []
+        skipped = 0
+        for input_filename, output_filename in zip(sources, output_filenames):
+            if not stale and self.is_up_to_date(input_filename, output_filename):
+                skipped += 1
+                report("{}: up to date".format(input_filename))
+                continue
+            tasks.append((input_filename, output_filename, self.config,
+                          self.cache_dir, prologue, self.source_maps))
+
+        failed = 0
+        start = time.perf_counter()
+        with ProcessPoolExecutor(max_workers=self.jobs) as executor:
+            for input_filename, elapsed, error in executor.map(_translate_file, tasks):
+                if error is not None:
+                    failed += 1
+                    report("{}: FAILED ({})".format(input_filename, error))
+                else:
+                    report("{}: {:.2f} ms".format(input_filename, elapsed * 1000))
+        elapsed = time.perf_counter() - start
+
+        if self.lua_init and self.minimal_lua_init:
+            self.write_runtime(output_filenames)
+
+        with open(self.get_stamp_filename(), "w") as file:
+            file.write(stamp)
+
+        report("Translated: {}, skipped: {}, failed: {}, jobs: {}, "
+               "time: {:.2f} s ({:.1f} files/s)".format(
+                   len(tasks) - failed, skipped, failed, self.jobs, elapsed,
+                   len(tasks) / elapsed if elapsed > 0 else 0.0))
+        return failed
@@ -0,0 +1,146 @@
+"""Build the lua initialization code used by the translated code"""
+import re
+
+from .translator import Translator
+
+
+class RuntimeBuilder:
+    """Split the lua initialization code into top-level definitions
+    and keep only the ones referenced by the translated code.
+
+    Dependencies between the definitions are found by scanning
+    identifiers, strings, comments and field names are skipped.
+    """
+    ALWAYS_USED = ("string_meta",)
+
+    TOKENS = re.compile(r"""
+        (?P<comment>--\[(?P<ceq>=*)\[.*?\](?P=ceq)\]|--[^\n]*)
+        | (?P<string>\[(?P<seq>=*)\[.*?\](?P=seq)\]
+            |"(?:\\.|[^"\\\n])*"|'(?:\\.|[^'\\\n])*')
+        | (?P<concat>\.\.\.?)
+        | (?P<field>[.:]\s*[A-Za-z_]\w*)
+        | (?P<number>\d[\w.]*)
+        | (?P<name>[A-Za-z_]\w*)
+    """, re.S | re.X)
+
+    DEFINITION = re.compile(r"(?:local\s+)?(?:function\s+([A-Za-z_]\w*)\s*\("
+                            r"|([A-Za-z_]\w*)\s*=(?!=))")
+
+    # The table changed by a statement like 'function t.f()' or 't.f = v'.
+    MEMBER = re.compile(r"(?:function\s+)?([A-Za-z_]\w*)\s*[.:\[]"
+                        r"|setmetatable\(\s*([A-Za-z_]\w*)")
+
+    def __init__(self, source=None):
+        if source is None:
+            source = Translator.get_luainit()
+
+        self.header = []
+        self.footer = []
+        self.pieces = []
+        self.members = []
+        self.split(source)
+
+        self.definitions = {}
+        for index, (names, _) in enumerate(self.pieces):
+            for name in names:
+                self.definitions[name] = index
+
+        self.dependencies = []
+        for index, (_, lines) in enumerate(self.pieces):
+            used = self.find_references("".join(lines))
+            self.dependencies.append({self.definitions[name] for name in used
+                                      if self.definitions[name] != index})
+
+        # A statement changing a table defined in an earlier piece is kept
+        # in its place, the piece defining the table depends on it.
+        for name, index in self.members:
+            owner = self.definitions.get(name)
+            if owner is not None and owner != index:
+                self.dependencies[owner].add(index)
+
+    @classmethod
+    def iter_identifiers(cls, lua_code):
+        """Iterate over the identifiers of the lua code"""
+        for match in cls.TOKENS.finditer(lua_code):
+            if match.lastgroup == "name":
+                yield match.group("name")
+
+    def find_references(self, lua_code):
+        """Return the runtime definitions referenced by the lua code"""
+        return {name for name in self.iter_identifiers(lua_code)
+                if name in self.definitions}
+
+    def split(self, source):
+        """Split the source into the header, top-level pieces and footer"""
+        pending = []
+        comment_end = None
+        for line in source.splitlines(keepends=True):
+            if comment_end is not None:
+                pending.append(line)
+                if comment_end in line:
+                    comment_end = None
+                continue
+
+            long_comment = re.match(r"--\[(=*)\[", line)
+            if long_comment:
+                comment_end = "]{}]".format(long_comment.group(1))
+                pending.append(line)
+                if comment_end in line[long_comment.end():]:
+                    comment_end = None
+                continue
+
+            if line.startswith("--") or (not self.pieces and not line.strip()):
+                pending.append(line)
+                continue
+
+            is_statement = re.match(r"[A-Za-z_]", line) and \
+                not re.match(r"end\b", line)
+            definition = self.DEFINITION.match(line) if is_statement else None
+            if definition:
+                name = definition.group(1) or definition.group(2)
+                if not self.pieces:
+                    self.header = pending
+                    pending = []
+                self.pieces.append(([name], pending + [line]))
+            elif self.pieces:
+                self.pieces[-1][1].extend(pending + [line])
+                member = self.MEMBER.match(line) if is_statement else None
+                if member:
+                    self.members.append((member.group(1) or member.group(2),
+                                         len(self.pieces) - 1))
+            else:
+                pending.append(line)
+                continue
+            pending = []
+
+        if self.pieces:
+            self.footer = pending
+        else:
+            self.header = pending
+
+    def resolve(self, names):
+        """Return indices of the pieces defining the names and their dependencies"""
+        indices = set()
+        queue = [self.definitions[name] for name in names
+                 if name in self.definitions]
+        queue.extend(self.definitions[name] for name in self.ALWAYS_USED
+                     if name in self.definitions)
+        while queue:
+            index = queue.pop()
+            if index not in indices:
+                indices.add(index)
+                queue.extend(self.dependencies[index] - indices)
+        return indices
+
+    def build_for_names(self, names):
+        """Return the initialization code with the definitions of the names"""
+        indices = self.resolve(names)
+        lines = list(self.header)
+        for index in sorted(indices):
+            lines.extend(self.pieces[index][1])
+        lines.extend(self.footer)
+        return "".join(lines)
+
+    def build(self, lua_code):
+        """Return the initialization code used by the translated lua code"""
+        return self.build_for_names(self.find_references(lua_code))
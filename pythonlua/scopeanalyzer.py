@@ -0,0 +1,191 @@
+"""Scope analysis pass"""
+import ast
+
+from .symboltable import SymbolTable
+
+
+class ScopeAnalyzer(ast.NodeVisitor):
+    """Build symbol tables of all scopes before the code emission"""
+    def __init__(self):
+        self.tables = {}
+        self.current = None
+        self.module = None
+
+        self.visitors = {
+            ast.AnnAssign: self.visit_AnnAssign,
+            ast.Attribute: self.visit_Attribute,
+            ast.ClassDef: self.visit_ClassDef,
+            ast.DictComp: self.visit_DictComp,
+            ast.FunctionDef: self.visit_FunctionDef,
+            ast.GeneratorExp: self.visit_GeneratorExp,
+            ast.Global: self.visit_Global,
+            ast.Import: self.visit_Import,
+            ast.ImportFrom: self.visit_ImportFrom,
+            ast.Lambda: self.visit_Lambda,
+            ast.ListComp: self.visit_ListComp,
+            ast.Module: self.visit_Module,
+            ast.Name: self.visit_Name,
+            ast.Nonlocal: self.visit_Nonlocal,
+            ast.SetComp: self.visit_SetComp,
+        }
+
+    def analyze(self, tree):
+        """Return symbol tables of the tree keyed by the scope nodes"""
+        self.visit(tree)
+        for table in self.tables.values():
+            table.resolve()
+        return self.tables
+
+    def visit(self, node):
+        """Visit a node within the current scope"""
+        visitor = self.visitors.get(node.__class__)
+        if visitor is None:
+            self.generic_visit(node)
+        else:
+            visitor(node)
+
+    def generic_visit(self, node):
+        """Visit all children of the node without recursion"""
+        visitors = self.visitors
+        stack = [node]
+        while stack:
+            children = ast.iter_child_nodes(stack.pop())
+            for child in children:
+                visitor = visitors.get(child.__class__)
+                if visitor is None:
+                    stack.append(child)
+                else:
+                    visitor(child)
+
+    def enter(self, node, name, kind):
+        """Enter a new scope, return the previous one"""
+        previous = self.current
+        self.current = SymbolTable(name, kind, parent=previous)
+        self.tables[node] = self.current
+        return previous
+
+    def add_arguments(self, arguments):
+        """Add function arguments as parameters of the current scope"""
+        args = list(arguments.args) + list(getattr(arguments, "kwonlyargs", []))
+        args += [arg for arg in (arguments.vararg, arguments.kwarg)
+                 if arg is not None]
+        for arg in args:
+            self.current.parameters.add(arg.arg)
+            if getattr(arg, "annotation", None) is not None:
+                self.current.annotations[arg.arg] = arg.annotation
+
+    def visit_Module(self, node):
+        """Visit module"""
+        previous = self.enter(node, "", SymbolTable.MODULE)
+        self.module = self.current
+        self.generic_visit(node)
+        self.current = previous
+
+    def visit_FunctionDef(self, node):
+        """Visit function definition"""
+        self.current.assigned.add(node.name)
+        for item in node.decorator_list + node.args.defaults:
+            self.visit(item)
+
+        previous = self.enter(node, node.name, SymbolTable.FUNCTION)
+        self.add_arguments(node.args)
+        for statement in node.body:
+            self.visit(statement)
+        self.current = previous
+
+    def visit_ClassDef(self, node):
+        """Visit class definition"""
+        self.current.assigned.add(node.name)
+        for item in node.decorator_list + node.bases:
+            self.visit(item)
+
+        previous = self.enter(node, node.name, SymbolTable.CLASS)
+        for statement in node.body:
+            self.visit(statement)
+        self.current = previous
+
+    def visit_Lambda(self, node):
+        """Visit lambda"""
+        for item in node.args.defaults:
+            self.visit(item)
+
+        previous = self.enter(node, "<lambda>", SymbolTable.FUNCTION)
+        self.add_arguments(node.args)
+        self.visit(node.body)
+        self.current = previous
+
+    def visit_comprehension_scope(self, node, elements):
+        """Visit list, set, dict comprehensions and generator expressions"""
+        # The first iterator is evaluated in the enclosing scope.
+        self.visit(node.generators[0].iter)
+
+        previous = self.enter(node, "<comprehension>", SymbolTable.FUNCTION)
+        for index, comp in enumerate(node.generators):
+            self.visit(comp.target)
+            if index > 0:
+                self.visit(comp.iter)
+            for if_ in comp.ifs:
+                self.visit(if_)
+        for element in elements:
+            self.visit(element)
+        self.current = previous
+
+    def visit_DictComp(self, node):
+        """Visit dictionary comprehension"""
+        self.visit_comprehension_scope(node, [node.key, node.value])
+
+    def visit_GeneratorExp(self, node):
+        """Visit generator expression"""
+        self.visit_comprehension_scope(node, [node.elt])
+
+    def visit_ListComp(self, node):
+        """Visit list comprehension"""
+        self.visit_comprehension_scope(node, [node.elt])
+
+    def visit_SetComp(self, node):
+        """Visit set comprehension"""
+        self.visit_comprehension_scope(node, [node.elt])
+
+    def visit_Global(self, node):
+        """Visit globals"""
+        self.current.globals.update(node.names)
+        # A module local would hide the name from the functions assigning it,
+        # whether the module assigns it before or after their definitions.
+        if self.module is not None:
+            self.module.globals.update(node.names)
+
+    def visit_Nonlocal(self, node):
+        """Visit nonlocals"""
+        self.current.nonlocals.update(node.names)
+
+    def visit_Import(self, node):
+        """Visit import"""
+        for name in node.names:
+            if name.asname is None:
+                self.current.assigned.add(name.name.split(".")[-1])
+            else:
+                self.current.assigned.add(name.asname)
+
+    def visit_ImportFrom(self, node):
+        """Visit import from"""
+        for name in node.names:
+            self.current.assigned.add(name.asname or name.name)
+
+    def visit_AnnAssign(self, node):
+        """Visit annotated assign, remember the annotations of the names"""
+        if isinstance(node.target, ast.Name):
+            self.current.annotations[node.target.id] = node.annotation
+        self.generic_visit(node)
+
+    def visit_Attribute(self, node):
+        """Visit attribute, remember the names of assigned attributes"""
+        if not isinstance(node.ctx, ast.Load):
+            self.current.attributes.add(node.attr)
+        self.visit(node.value)
+
+    def visit_Name(self, node):
+        """Visit name"""
+        if isinstance(node.ctx, ast.Load):
+            self.current.referenced.add(node.id)
+        else:
+            self.current.assigned.add(node.id)
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""Source maps of the translated lua code"""
+from argparse import ArgumentParser
+import ast
+import json
+import os
+import re
+import sys
+
+
+class SourceMap:
+    """Python positions of the lines of a translated lua file.
+
+    The map is saved as JSON next to the lua file. The item i of the
+    mappings is the [line, column] of the python statement which produced
+    the lua line i + 1, or null for the lines of the runtime and the other
+    generated code. The functions are the qualified names of the python
+    functions by the lines of their definitions.
+    """
+    VERSION = 1
+    EXTENSION = ".map"
+
+    # Lua locations of tracebacks, error messages and profiler reports,
+    # the frames of the profiler are prefixed by the function name.
+    LUA_LOCATION = re.compile(r"(?:(?P<name>[^\s:;'\"()<>\[\]@]+)@)?"
+                              r"(?P<file>[^\s:;'\"()<>\[\]@]+\.lua):(?P<line>\d+)")
+
+    def __init__(self, source, file, mappings=None, functions=None):
+        self.source = source
+        self.file = file
+        self.mappings = list(mappings) if mappings is not None else []
+        self.functions = dict(functions) if functions is not None else {}
+
+    @staticmethod
+    def get_function_names(py_ast_tree):
+        """Return the qualified names of the python functions by their lines"""
+        names = {}
+
+        def visit(node, prefix):
+            """Collect the names of the functions nested into the node"""
+            for child in ast.iter_child_nodes(node):
+                if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                    names.setdefault(child.lineno, prefix + child.name)
+                    visit(child, prefix + child.name + ".<locals>.")
+                elif isinstance(child, ast.ClassDef):
+                    visit(child, prefix + child.name + ".")
+                elif isinstance(child, ast.Lambda):
+                    names.setdefault(child.lineno, prefix + "<lambda>")
+                    visit(child, prefix + "<lambda>.<locals>.")
+                else:
+                    visit(child, prefix)
+
+        visit(py_ast_tree, "")
+        return names
+
+    @classmethod
+    def get_filename(cls, lua_filename):
+        """Return the path of the source map of the lua file"""
+        return lua_filename + cls.EXTENSION
+
+    def shift(self, count):
+        """Account for the lines written before the translated code"""
+        self.mappings[:0] = [None] * count
+
+    def lookup(self, line):
+        """Return the python line and column of the lua line or None"""
+        if 1 <= line <= len(self.mappings):
+            return self.mappings[line - 1]
+        return None
+
+    def save(self, filename):
+        """Write the source map as JSON"""
+        data = {
+            "version": self.VERSION,
+            "source": self.source,
+            "file": self.file,
+            "mappings": [list(position) if position is not None else None
+                         for position in self.mappings],
+            "functions": {str(line): name for line, name in self.functions.items()},
+        }
+        with open(filename, "w") as file:
+            json.dump(data, file, separators=(",", ":"))
+
+    @classmethod
+    def load(cls, filename):
+        """Read the source map written by save"""
+        with open(filename, "r") as file:
+            data = json.load(file)
+
+        if data.get("version") != cls.VERSION:
+            raise RuntimeError("Unsupported source map version in '{}'.".format(filename))
+
+        mappings = [tuple(position) if position is not None else None
+                    for position in data["mappings"]]
+        functions = {int(line): name
+                     for line, name in data.get("functions", {}).items()}
+        return cls(data["source"], data["file"], mappings, functions)
+
+    @classmethod
+    def load_all(cls, path):
+        """Read the source map or all source maps of the directory"""
+        if not os.path.isdir(path):
+            return [cls.load(path)]
+
+        source_maps = []
+        for folder, dirnames, filenames in os.walk(path):
+            dirnames.sort()
+            source_maps.extend(cls.load(os.path.join(folder, name))
+                               for name in sorted(filenames)
+                               if name.endswith(".lua" + cls.EXTENSION))
+        return source_maps
+
+    @staticmethod
+    def find(source_maps, lua_filename):
+        """Return the source map of the lua file referenced by lua or None.
+
+        Lua shows the path the file was loaded by and cuts long paths,
+        so the map whose file shares the most trailing path components
+        with the reference is taken.
+        """
+        parts = lua_filename.replace("\\", "/").split("/")
+        best, best_count = None, 0
+        for source_map in source_maps:
+            map_parts = source_map.file.replace("\\", "/").split("/")
+            count = 0
+            while count < min(len(parts), len(map_parts)) and \
+                    parts[-1 - count] == map_parts[-1 - count]:
+                count += 1
+            if count > best_count:
+                best, best_count = source_map, count
+        return best
+
+    @classmethod
+    def rewrite(cls, text, source_maps):
+        """Replace the lua locations of the text by the python locations"""
+        def replace(match):
+            """Return the python location of the matched lua location"""
+            source_map = cls.find(source_maps, match.group("file"))
+            if source_map is None:
+                return match.group(0)
+
+            position = source_map.lookup(int(match.group("line")))
+            if position is None:
+                return match.group(0)
+
+            location = "{}:{}".format(source_map.source, position[0])
+            name = match.group("name")
+            if name is None:
+                return location
+            return "{}@{}".format(source_map.functions.get(position[0], name), location)
+
+        return cls.LUA_LOCATION.sub(replace, text)
+
+
+def main():
+    """Rewrite lua tracebacks and profiler reports in python terms"""
+    parser = ArgumentParser(description="Replace the lua file locations of tracebacks, "
+                                        "error messages and profiler reports by the "
+                                        "python locations of the source maps.")
+    parser.add_argument("maps", nargs="+", metavar="MAP",
+                        help="Source map written by the translator, or a directory "
+                             "with the source maps of a translated project.")
+    parser.add_argument("-i", "--input", metavar="FILE", default=None,
+                        help="Text to rewrite, the standard input by default.")
+    argv = parser.parse_args()
+
+    source_maps = []
+    for path in argv.maps:
+        source_maps.extend(SourceMap.load_all(path))
+
+    if argv.input is None:
+        text = sys.stdin.read()
+    else:
+        with open(argv.input, "r") as file:
+            text = file.read()
+
+    sys.stdout.write(SourceMap.rewrite(text, source_maps))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
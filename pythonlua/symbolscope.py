@@ -0,0 +1,10 @@
+"""Symbol scope"""
+from enum import Enum
+
+
+class SymbolScope(Enum):
+    """This enum represents where a name is resolved"""
+    LOCAL = 0
+    UPVALUE = 1
+    GLOBAL_IMPLICIT = 2
+    GLOBAL_EXPLICIT = 3
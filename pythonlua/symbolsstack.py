@@ -5,17 +5,16 @@ class SymbolsStack:
     """Class for the symbols stack"""
     def __init__(self):
         self.symbols = [[]]
+        self.counts = {}
 
     def add_symbol(self, name):
         """Add a new symbol to the curent stack"""
         self.symbols[-1].append(name)
+        self.counts[name] = self.counts.get(name, 0) + 1
 
     def exists(self, name):
         """Check symbol is exists in the current stack"""
-        for stack in self.symbols:
-            if name in stack:
-                return True
-        return False
+        return name in self.counts
 
     def push(self):
         """Push the symbols stack"""
@@ -23,4 +22,9 @@ class SymbolsStack:
 
     def pop(self):
         """Pop the symbols stack"""
-        self.symbols.pop()
+        for name in self.symbols.pop():
+            count = self.counts[name] - 1
+            if count:
+                self.counts[name] = count
+            else:
+                del self.counts[name]
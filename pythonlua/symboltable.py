@@ -0,0 +1,66 @@
+"""Symbol table of a python scope"""
+from .symbolscope import SymbolScope
+
+
+class SymbolTable:
+    """Names of a single python scope (module, class, function)"""
+    MODULE = "module"
+    CLASS = "class"
+    FUNCTION = "function"
+
+    def __init__(self, name, kind, parent=None):
+        self.name = name
+        self.kind = kind
+        self.parent = parent
+
+        self.parameters = set()
+        self.assigned = set()
+        self.referenced = set()
+        self.globals = set()
+        self.nonlocals = set()
+        # Attribute names assigned or deleted in this scope (obj.name = ...).
+        self.attributes = set()
+        # Annotations of the names assigned in this scope (name: List[int] = ...).
+        self.annotations = {}
+
+        self.symbols = {}
+
+    def binds(self, name):
+        """Check the name is bound in this scope"""
+        return ((name in self.assigned or name in self.parameters)
+                and name not in self.globals and name not in self.nonlocals)
+
+    def resolve(self):
+        """Resolve the scope of every name used in this scope"""
+        names = (self.parameters | self.assigned | self.referenced
+                 | self.globals | self.nonlocals)
+        self.symbols = {name: self.resolve_name(name) for name in names}
+
+    def resolve_name(self, name):
+        """Return the scope of the name"""
+        if name in self.globals:
+            return SymbolScope.GLOBAL_EXPLICIT
+        if name in self.nonlocals:
+            return SymbolScope.UPVALUE
+        if self.binds(name):
+            return SymbolScope.LOCAL
+
+        parent = self.parent
+        while parent is not None:
+            # Class scopes are not visible from the nested scopes.
+            if parent.kind != SymbolTable.CLASS and parent.binds(name):
+                return SymbolScope.UPVALUE
+            parent = parent.parent
+
+        return SymbolScope.GLOBAL_IMPLICIT
+
+    def get_scope(self, name):
+        """Return the scope of the name used in this scope"""
+        scope = self.symbols.get(name)
+        if scope is None:
+            scope = self.symbols[name] = self.resolve_name(name)
+        return scope
+
+    def is_local(self, name):
+        """Check the name is a local variable of this scope"""
+        return self.get_scope(name) == SymbolScope.LOCAL
@@ -0,0 +1,147 @@
+"""Persistent content-addressed cache for the translated code"""
+import hashlib
+import json
+import os
+import tempfile
+
+from . import __version__
+
+
+class TranslationCache:
+    """On-disk cache of translated lua code.
+
+    Entries are keyed by a hash of the python source, the translator
+    config data, the translator version and the fingerprint of the
+    translator sources, so an upgraded translator misses the entries of
+    the previous one. The cache keeps at most max_size bytes on disk and
+    evicts the least recently used entries.
+    """
+    EXTENSION = ".lua"
+
+    # Files of the package which change the emitted code.
+    FINGERPRINT_EXTENSIONS = (".py", ".lua")
+
+    _fingerprint = None
+
+    def __init__(self, directory, max_size=64 * 1024 * 1024):
+        self.directory = directory
+        self.max_size = max_size
+
+        self.hits = 0
+        self.misses = 0
+
+        os.makedirs(self.directory, exist_ok=True)
+
+        self.entries = {}
+        self.size = 0
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and entry.name.endswith(self.EXTENSION):
+                self.entries[entry.name] = entry.stat().st_size
+                self.size += self.entries[entry.name]
+
+    @classmethod
+    def get_fingerprint(cls):
+        """Return the fingerprint of the installed translator"""
+        if cls._fingerprint is None:
+            directory = os.path.dirname(os.path.abspath(__file__))
+            cls._fingerprint = cls.make_fingerprint(directory)
+        return cls._fingerprint
+
+    @classmethod
+    def make_fingerprint(cls, directory):
+        """Return the hash of the translator sources and the lua runtime"""
+        digest = hashlib.sha256()
+        for name in sorted(os.listdir(directory)):
+            if not name.endswith(cls.FINGERPRINT_EXTENSIONS):
+                continue
+            digest.update(name.encode("utf-8"))
+            digest.update(b"\0")
+            with open(os.path.join(directory, name), "rb") as file:
+                digest.update(file.read())
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    @classmethod
+    def make_key(cls, pycode, config, fingerprint=None):
+        """Return the cache key for the given source and config"""
+        config_data = json.dumps(config.data, sort_keys=True, default=str)
+        if fingerprint is None:
+            fingerprint = cls.get_fingerprint()
+
+        digest = hashlib.sha256()
+        for part in (__version__, fingerprint, config_data, pycode):
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    def get(self, key):
+        """Return the cached lua code or None if the key is not cached"""
+        path = self.get_path(key)
+        try:
+            with open(path, "r") as file:
+                lua_code = file.read()
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+
+        # Touch the entry, eviction removes the least recently used ones.
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+        self.hits += 1
+        return lua_code
+
+    def put(self, key, lua_code):
+        """Store the translated lua code"""
+        name = key + self.EXTENSION
+        data = lua_code.encode("utf-8")
+
+        file_desc, tmp_path = tempfile.mkstemp(dir=self.directory,
+                                               suffix=".tmp")
+        with os.fdopen(file_desc, "wb") as file:
+            file.write(data)
+        os.replace(tmp_path, self.get_path(key))
+
+        self.size += len(data) - self.entries.get(name, 0)
+        self.entries[name] = len(data)
+
+        if self.size > self.max_size:
+            self.evict()
+
+    def evict(self):
+        """Remove the least recently used entries until the cache fits"""
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and entry.name.endswith(self.EXTENSION):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, entry.name, stat.st_size))
+        entries.sort()
+
+        self.entries = {name: size for _, name, size in entries}
+        self.size = sum(self.entries.values())
+
+        for _, name, size in entries:
+            if self.size <= self.max_size:
+                break
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                pass
+            del self.entries[name]
+            self.size -= size
+
+    def clear(self):
+        """Remove all cached entries"""
+        for name in list(self.entries):
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                pass
+        self.entries = {}
+        self.size = 0
+
+    def get_path(self, key):
+        """Return the path to the cache entry"""
+        return os.path.join(self.directory, key + self.EXTENSION)
@@ -1,56 +1,131 @@
 """Python to lua translator class"""
 import ast
+import io
 import os
+import sys
 
+from .codewriter import CodeWriter
 from .config import Config
+from .constantfolder import ConstantFolder
+from .globalshoister import GlobalsHoister
 from .nodevisitor import NodeVisitor
+from .profilingnodevisitor import ProfilingNodeVisitor
+from .scopeanalyzer import ScopeAnalyzer
+from .sourcemap import SourceMap
 
 
 class Translator:
     """Python to lua main class translator"""
-    def __init__(self, config=None, show_ast=False):
+    def __init__(self, config=None, show_ast=False, cache=None,
+                 profile=False, source_map=False):
         self.config = config if config is not None else Config()
         self.show_ast = show_ast
+        self.cache = cache
+        self.profile = profile
+        self.profile_stats = None
 
-        self.output = []
+        # Python positions of the lines of the last translated code and
+        # the names of its functions, collected for the source map.
+        self.source_map = source_map
+        self.positions = None
+        self.functions = None
 
     def translate(self, pycode):
         """Translate python code to lua code"""
+        if not self.use_cache():
+            return self.translate_source(pycode)
+
+        key = self.cache.make_key(pycode, self.config)
+        lua_code = self.cache.get(key)
+        if lua_code is None:
+            lua_code = self.translate_source(pycode)
+            self.cache.put(key, lua_code)
+
+        return lua_code
+
+    def translate_to_stream(self, pycode, stream):
+        """Translate python code and write lua code into the text stream"""
+        if self.use_cache():
+            stream.write(self.translate(pycode))
+            return
+
+        self.write_code(pycode, stream)
+
+    def use_cache(self):
+        """Check the translated code can be taken from the cache"""
+        return self.cache is not None and not self.show_ast and not self.source_map
+
+    def translate_source(self, pycode):
+        """Translate python code to lua code bypassing the cache"""
+        stream = io.StringIO()
+        self.write_code(pycode, stream)
+        return stream.getvalue()
+
+    def write_code(self, pycode, stream):
+        """Translate python code writing lines as soon as they are emitted"""
+        py_ast_tree = self.parse(pycode)
+        symbol_tables = self.analyze(py_ast_tree)
+        if self.source_map:
+            self.functions = SourceMap.get_function_names(py_ast_tree)
+        self.emit(py_ast_tree, symbol_tables, stream)
+
+    def parse(self, pycode):
+        """Parse python code into the ast tree and run the optimization passes"""
         py_ast_tree = ast.parse(pycode)
 
-        visitor = NodeVisitor(config=self.config)
-
         if self.show_ast:
             print(ast.dump(py_ast_tree))
 
-        visitor.visit(py_ast_tree)
+        if self.config["optimizations"]["constant_folding"]:
+            py_ast_tree = ConstantFolder().visit(py_ast_tree)
 
-        self.output = visitor.output
+        return py_ast_tree
 
-        return self.to_code()
+    def analyze(self, py_ast_tree):
+        """Build the symbol tables of all scopes of the ast tree"""
+        return ScopeAnalyzer().analyze(py_ast_tree)
 
-    def to_code(self, code=None, indent=0):
-        """Create a lua code from the compiler output"""
-        code = code if code is not None else self.output
+    def emit(self, py_ast_tree, symbol_tables, stream):
+        """Write lua code of the analyzed ast tree into the text stream"""
+        # The aliases are collected while the module is emitted, the code is
+        # buffered to write their declaration on the first line.
+        hoister = None
+        output = stream
+        if self.config["optimizations"]["hoist_globals"]:
+            hoister = GlobalsHoister(symbol_tables, self.get_luainit())
+            output = io.StringIO()
 
-        def add_indentation(line):
-            """Add indentation to the given line"""
-            indentation_width = 4
-            indentation_space = " "
+        positions = [] if self.source_map else None
+
+        visitor_class = ProfilingNodeVisitor if self.profile else NodeVisitor
+        visitor = visitor_class(config=self.config,
+                                writer=CodeWriter(output, positions),
+                                symbol_tables=symbol_tables, hoister=hoister)
+        visitor.visit(py_ast_tree)
 
-            indent_copy = max(indent, 0)
+        if hoister is not None:
+            header = hoister.get_header()
+            if header is not None:
+                stream.write(header + "\n")
+                if positions is not None:
+                    positions.insert(0, None)
+            stream.write(output.getvalue())
 
-            return indentation_space * indentation_width * indent_copy + line
+        self.positions = positions
 
-        lines = []
-        for line in code:
-            if isinstance(line, str):
-                lines.append(add_indentation(line))
-            elif isinstance(line, list):
-                sub_code = self.to_code(line, indent + 1)
-                lines.append(sub_code)
+        if self.profile:
+            self.profile_stats = visitor.stats
+            visitor.print_report(file=sys.stderr)
 
-        return "\n".join(lines)
+    @staticmethod
+    def get_lua_profiler():
+        """Get lua code installing the sampling profiler."""
+        return Translator.get_luainit("luaprofiler.lua")
+
+    @staticmethod
+    def get_lua_allocations():
+        """Get lua code tracking the allocations of the runtime."""
+        return Translator.get_luainit("luaallocations.lua")
 
     @staticmethod
     def get_luainit(filename="luainit.lua"):
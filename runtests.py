@@ -1,26 +1,192 @@
 #!/usr/bin/env python3
 """Run all tests from the tests folder"""
+from argparse import ArgumentParser
+from concurrent.futures import ThreadPoolExecutor
 import os
+import queue
 import re
 import subprocess
 import sys
+import threading
+import time
 
-from tempfile import mkstemp
+from tempfile import mkstemp, TemporaryFile
 
 from colorama import init, Fore, Style
 
+from pythonlua.config import Config
+from pythonlua.luatarget import LuaTarget
 from pythonlua.translator import Translator
 
 
 TESTS_FOLDER = "tests"
 LUA_PATH = "lua"
+TIMEOUT = 30
 
 EXPECTED_FORMAT = "{}.expected"
+# Output of the target which differs from the common one, e.g. the
+# division results printed as floats since lua 5.3.
+TARGET_EXPECTED_FORMAT = "{}.{}.expected"
+TARGET_EXPECTED_FALLBACK = {
+    "5.4": "5.3",
+}
+
+# Ends the output of every chunk, followed by "<status> <size>\n" and the
+# error message of the chunk.
+RESULT_MARKER = b"\0\0pythonlua-result\0"
+
+# Loaded once by a worker after the lua init code. The chunks are read from
+# stdin as "<name> <size>\n<code>" and run in their own global environment,
+# so the globals of a test do not leak into the next one.
+LUA_WORKER = r"""
+do
+    local stdin, stdout = io.stdin, io.stdout
+    local marker = "\0\0pythonlua-result\0"
+
+    local function compile(code, name, env)
+        if setfenv ~= nil then
+            local chunk, message = loadstring(code, name)
+            if chunk ~= nil then
+                setfenv(chunk, env)
+            end
+            return chunk, message
+        end
+        return load(code, name, "t", env)
+    end
+
+    stdout:setvbuf("full")
+    while true do
+        local header = stdin:read("*l")
+        if header == nil then
+            break
+        end
+        local name, size = header:match("^(.-) (%d+)$")
+        local code = stdin:read(tonumber(size)) or ""
+
+        local env = setmetatable({}, { __index = _G })
+        env._G = env
+        local chunk, message = compile(code, "@" .. name .. ".lua", env)
+        local ok = chunk ~= nil
+        if ok then
+            ok, message = xpcall(chunk, debug.traceback)
+        end
+
+        message = ok and "" or tostring(message)
+        stdout:write(marker, ok and "ok" or "error", " ", #message, "\n", message)
+        stdout:flush()
+    end
+end
+"""
+
+
+class LuaWorker:
+    """Long-lived lua process running the chunks fed over a pipe"""
+    READ_SIZE = 65536
+
+    def __init__(self, lua_path, script, timeout=TIMEOUT):
+        self.lua_path = lua_path
+        self.script = script
+        self.timeout = timeout
+        self.timed_out = False
+        self.proc = None
+        self.stderr = None
+
+    def start(self):
+        """Start the lua process, it loads the runtime once"""
+        self.timed_out = False
+        self.stderr = TemporaryFile()
+        self.proc = subprocess.Popen([self.lua_path, self.script],
+                                     stdin=subprocess.PIPE,
+                                     stdout=subprocess.PIPE,
+                                     stderr=self.stderr)
+
+    def stop(self):
+        """Close the pipes and wait for the lua process"""
+        if self.proc is None:
+            return
+        for stream in (self.proc.stdin, self.proc.stdout):
+            try:
+                stream.close()
+            except OSError:
+                pass
+        self.proc.wait()
+        self.stderr.close()
+        self.proc = None
+
+    def run(self, name, lua_code):
+        """Run the chunk, return its output and error message or None"""
+        if self.proc is None:
+            self.start()
+
+        # The process is killed at the deadline, the next chunk restarts it.
+        timer = threading.Timer(self.timeout, self.kill, [self.proc])
+        timer.start()
+        try:
+            code = lua_code.encode("utf-8")
+            try:
+                self.proc.stdin.write("{} {}\n".format(name, len(code)).encode("utf-8"))
+                self.proc.stdin.write(code)
+                self.proc.stdin.flush()
+            except OSError:
+                pass
+            return self.read_result()
+        finally:
+            timer.cancel()
+            timer.join()
+            if self.timed_out and self.proc is not None:
+                self.stop()
+
+    def kill(self, proc):
+        """Kill the lua process running the chunk too long"""
+        self.timed_out = True
+        proc.kill()
+
+    def read_result(self):
+        """Read the output of the chunk up to its result"""
+        buffer = bytearray()
+        searched = 0
+        while True:
+            index = buffer.find(RESULT_MARKER, searched)
+            if index >= 0:
+                end = buffer.find(b"\n", index)
+                if end >= 0:
+                    status, size = buffer[index + len(RESULT_MARKER):end].split()
+                    size = int(size)
+                    while len(buffer) < end + 1 + size:
+                        buffer.extend(self.read())
+                    message = buffer[end + 1:end + 1 + size].decode("utf-8", "replace")
+                    output = buffer[:index].decode("utf-8")
+                    return output, message if status == b"error" else None
+            else:
+                searched = max(0, len(buffer) - len(RESULT_MARKER))
+
+            data = self.read()
+            if data is None:
+                # The chunk ended the process, e.g. by os.exit().
+                return buffer.decode("utf-8", "replace"), self.get_exit_message()
+            buffer.extend(data)
+
+    def read(self):
+        """Read the available output of the process, None at its end"""
+        data = os.read(self.proc.stdout.fileno(), self.READ_SIZE)
+        return data if data else None
+
+    def get_exit_message(self):
+        """Stop the exited process and return its exit code and stderr"""
+        self.proc.wait()
+        self.stderr.seek(0)
+        if self.timed_out:
+            message = "lua timed out after {} s".format(self.timeout)
+        else:
+            message = "lua exited with code {}: {}".format(
+                self.proc.returncode, self.stderr.read().decode("utf-8", "replace").strip())
+        self.stop()
+        return message
 
 
 def get_all_tests(folder):
     """Get all test filenames"""
-    filenames = [os.path.join(folder, f) for f in os.listdir(folder)
+    filenames = [os.path.join(folder, f) for f in sorted(os.listdir(folder))
                  if re.match(r".*\.py$", f)]
 
     for fname in filenames:
@@ -33,83 +199,117 @@ def get_all_tests(folder):
     return filenames
 
 
-def make_test(filename):
-    """Make test"""
-    print("Testing file: {}".format(filename), end=" ")
-
-    content = None
-    expected = None
+def get_expected_filename(filename, target):
+    """Return the file of the expected output of the test for the target"""
+    while target is not None:
+        expected = TARGET_EXPECTED_FORMAT.format(filename, target)
+        if os.path.isfile(expected):
+            return expected
+        target = TARGET_EXPECTED_FALLBACK.get(target)
+    return EXPECTED_FORMAT.format(filename)
 
-    with open(filename) as file:
-        content = file.read()
-    with open(EXPECTED_FORMAT.format(filename)) as file:
-        expected = file.read()
 
-    if content is None or expected is None:
-        return False
-
-    result = None
+def make_test(filename, workers, config):
+    """Make test, return the result, the elapsed time and the report lines"""
+    start = time.perf_counter()
+    report = []
 
     try:
-        translator = Translator()
-        lua_code = translator.translate(content)
+        with open(filename) as file:
+            content = file.read()
+        with open(get_expected_filename(filename, config["target"])) as file:
+            expected = file.read()
 
-        file_desc, filename = mkstemp()
-
-        tmp_file = os.fdopen(file_desc, "w")
-        tmp_file.write(Translator.get_luainit()+ "\n")
-        tmp_file.write(lua_code)
-        tmp_file.flush()
-        tmp_file.close()
-
-        output = []
-
-        proc = subprocess.Popen([LUA_PATH, filename],
-                                stdout=subprocess.PIPE,
-                                stderr=subprocess.PIPE,)
-        while True:
-            line = proc.stdout.readline()
-            if line == b"":
-                break
-            else:
-                output.append(line.decode("utf-8"))
-
-        output = "".join(output)
+        translator = Translator(config)
+        lua_code = translator.translate(content)
 
-        os.remove(filename)
+        worker = workers.get()
+        try:
+            output, error = worker.run(filename, lua_code)
+        finally:
+            workers.put(worker)
 
         output = [item.strip() for item in output.split("\n")]
         expected = [item.strip() for item in expected.split("\n")]
 
-        if output != expected:
-            print("output: ", output)
-            print("expected: ", expected)
-
         result = output == expected
-    except RuntimeError:
+        if not result:
+            report.append("output: {}".format(output))
+            report.append("expected: {}".format(expected))
+            if error is not None:
+                report.append("error: {}".format(error))
+    except Exception as ex:
         result = False
-
-    print(Fore.GREEN + "PASSED" if result else Fore.RED + "FAILED")
-    print(Style.RESET_ALL, end="")
-    return result
+        report.append("error: {}: {}".format(type(ex).__name__, ex))
+
+    return result, time.perf_counter() - start, report
+
+
+def create_arg_parser():
+    """Create the command line parser of the tests"""
+    parser = ArgumentParser(description="Run the tests of the tests folder by a pool "
+                                        "of lua processes.")
+    parser.add_argument("tests", nargs="*", metavar="TEST",
+                        help="Test files to run, all tests by default.")
+    parser.add_argument("-j", "--jobs", type=int, default=None,
+                        help="Number of lua processes, the number of CPUs by default.")
+    parser.add_argument("--lua", default=LUA_PATH,
+                        help="Lua interpreter to run the tests with.")
+    parser.add_argument("--target", default=LuaTarget.DEFAULT, choices=list(LuaTarget.TARGETS),
+                        help="Lua version the tests are translated for, it should match "
+                             "the interpreter. Default: %(default)s.")
+    parser.add_argument("--timeout", type=float, default=TIMEOUT,
+                        help="Seconds a test may run before its lua process is killed "
+                             "and restarted. Default: %(default)s.")
+    return parser
 
 
 def main():
     """Main tests entrypoint"""
     init()
+    argv = create_arg_parser().parse_args()
 
-    tests = get_all_tests(TESTS_FOLDER)
+    config = Config()
+    config.data["target"] = argv.target
 
-    passed = 0
+    tests = argv.tests if argv.tests else get_all_tests(TESTS_FOLDER)
+    jobs = max(1, min(argv.jobs or os.cpu_count() or 1, len(tests)))
 
-    for test in tests:
-        if make_test(test):
-            passed += 1
+    file_desc, script = mkstemp(suffix=".lua")
+    with os.fdopen(file_desc, "w") as file:
+        file.write(Translator.get_luainit() + "\n")
+        file.write(LUA_WORKER)
+
+    # The workers load the runtime in parallel before the first test.
+    workers = queue.Queue()
+    for _ in range(jobs):
+        worker = LuaWorker(argv.lua, script, argv.timeout)
+        worker.start()
+        workers.put(worker)
+
+    passed = 0
+    start = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=jobs) as executor:
+            results = executor.map(lambda test: make_test(test, workers, config), tests)
+            for test, (result, elapsed, report) in zip(tests, results):
+                print("Testing file: {}".format(test), end=" ")
+                for line in report:
+                    print(line)
+                print(Fore.GREEN + "PASSED" if result else Fore.RED + "FAILED", end="")
+                print(Style.RESET_ALL + " ({:.2f} ms)".format(elapsed * 1000))
+                if result:
+                    passed += 1
+    finally:
+        while not workers.empty():
+            workers.get().stop()
+        os.remove(script)
+    elapsed = time.perf_counter() - start
 
     print("=" * 80)
-    print("Passed: {}/{}".format(passed, len(tests)))
+    print("Passed: {}/{}, jobs: {}, time: {:.2f} s".format(passed, len(tests), jobs, elapsed))
     return 0
 
 
 if __name__ == "__main__":
-    sys.exit(main())
\ No newline at end of file
+    sys.exit(main())
@@ -11,7 +11,7 @@ setup(
     author_email="mail@eremindmitry.ru",
     licence="Apache 2.0",
     python_requires=">=3.4",
-    packages=find_packages(),
+    packages=find_packages(exclude=["benchmarks"]),
     long_description="",
     classifiers=[
         "Operating System :: OS Independent",
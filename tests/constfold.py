@@ -0,0 +1,27 @@
+SECONDS_PER_DAY = 60 * 60 * 24
+print(SECONDS_PER_DAY)
+print(2 ** 10)
+print(7 // 2)
+print(-7 // 2)
+print(7 // -2)
+print(-7 % 3)
+print(7 % -3)
+print(-(-5))
+print(~5)
+print(1 << 4)
+print(6 & 3 | 8)
+print("py" + "thon")
+print("ab" * 3)
+print(1 < 2 < 3)
+print(3 < 2 < 1)
+print("b" in "abc")
+print(not 0)
+print(not "")
+print(0 or "default")
+print(1 and 2 and 3)
+print("yes" if 0 else "no")
+
+x = 5
+print(x + 2 * 3)
+print(True and x)
+print(1 / 0 if x < 0 else x)
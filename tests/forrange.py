@@ -0,0 +1,33 @@
+for i in range(3):
+    print(i)
+
+for i in range(2, 5):
+    print(i)
+
+for i in range(10, 0, -3):
+    print(i)
+
+n = 4
+for i in range(n * 2, n, -1):
+    print(i)
+
+for i in range(0, n, 3):
+    print(i)
+
+for i in range(5, 5):
+    print("never")
+
+for i in range(0, n, n // 2):
+    print(i)
+
+squares = [i * i for i in range(1, n)]
+for square in squares:
+    print(square)
+
+def count(range):
+    total = 0
+    for i in range(3):
+        total += i
+    return total
+
+print(count(lambda x: [10, 20]))
@@ -0,0 +1,20 @@
+def setter():
+    global counter
+    counter = 1
+
+
+def increment():
+    global counter
+    counter += 10
+
+
+def show():
+    print("counter = ", counter)
+
+
+counter = 0
+print("counter = ", counter)
+setter()
+print("counter = ", counter)
+increment()
+show()
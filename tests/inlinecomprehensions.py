@@ -0,0 +1,25 @@
+def evens(items):
+    return [x for x in items if x % 2 == 0]
+
+
+class Table:
+    rows = [i * 2 for i in range(3)]
+
+
+result = [1, 2, 3, 4]
+size = {v: v * v for v in result}
+for value in [r * 10 for r in result]:
+    if value == 20:
+        continue
+    print(value)
+
+for key in {k: 0 for k in "ab"}:
+    print(key)
+
+names = {}
+names["letters"] = [c for c in "xyz" if c != "y"]
+remainders = {r % 3 for r in result}
+
+print(len(evens(result)), evens(result)[1], Table.rows[2], size[3])
+print(names["letters"][1], len(remainders), 2 in remainders)
+print(len([n for n in [1, 2, 3] if n > 1]))
@@ -0,0 +1,38 @@
+class Shape:
+    SIDES = 0
+
+    def __init__(self, name):
+        self.name = name
+
+    def sides(self):
+        return self.SIDES
+
+    def describe(self):
+        print(self.name + " has " + str(self.sides()) + " sides")
+
+    def greet(self):
+        return "hello"
+
+
+class Square(Shape):
+    SIDES = 4
+
+
+class Circle(Shape):
+    def sides(self):
+        return 0
+
+
+square = Square("square")
+square.describe()
+Circle("circle").describe()
+
+Shape.SIDES = 3
+Shape("triangle").describe()
+
+square.greet = lambda: "shadowed"
+print(square.greet())
+print(Circle("other").greet())
+
+method = square.describe
+method()
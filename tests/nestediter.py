@@ -0,0 +1,39 @@
+numbers = [1, 2, 3]
+for a in numbers:
+    for b in numbers:
+        print(a, b)
+
+ages = {"john": 42}
+for name in ages:
+    for other in ages:
+        print(name, other, ages[name])
+
+for key in ages.keys():
+    print(key)
+
+for value in ages.values():
+    print(value)
+
+for key, value in ages.items():
+    print(key, value)
+
+for char in "abc":
+    print(char)
+
+for i, char in enumerate("xy"):
+    print(i, char)
+
+for i, number in enumerate(numbers, 1):
+    print(i, number)
+
+print(len(list(range(0, 10, 3))))
+
+_ = "outer"
+for item in numbers:
+    print(_, item)
+
+evens = [n for n in numbers if n != 2]
+for n in evens:
+    print(n)
+
+print(all([1, 2]), any([False, False]))
@@ -0,0 +1,27 @@
+x = 1
+
+
+def shadow(n):
+    n = n + 1
+    x = n * 10
+    return x
+
+
+def outer():
+    total = 0
+
+    def inner(value):
+        nonlocal total
+        total = total + value
+
+    inner(2)
+    inner(3)
+    return total
+
+
+print(shadow(1), x)
+print(outer())
+
+a, b = 1, 2
+c, a = 3, 4
+print(a, b, c)
@@ -0,0 +1,55 @@
+List = list
+
+values: List[float] = [1.5, 2.5, 4.5]
+counts: List[int] = []
+plain: list = [1, "a"]
+declared: int
+
+for i in range(10):
+    counts.append(i * i)
+
+counts.insert(0, -1)
+counts.insert(-1, 100)
+print(len(counts), counts[0], counts[-1], counts[-2], counts[1])
+print(counts.pop(), counts.pop(0), len(counts))
+counts.remove(100)
+print(counts.index(16), counts.count(4), 16 in counts, 17 in counts)
+counts.reverse()
+print(counts[0], counts[-1])
+counts.sort()
+print(counts[0], counts[-1])
+
+copy = counts.copy()
+copy[0] = 42
+copy[1] += 5
+print(copy[0], copy[1], counts[0], bool(copy), len(copy))
+
+total = 0
+for value in values:
+    total += value
+print(total)
+
+
+def source(items):
+    return items
+
+
+def scale(items: List[float], factor):
+    result: List[float] = source(items)
+    print(items[0], items[-1])
+    for i in range(len(result)):
+        result[i] *= factor
+    result[0] = result[-1] + 1
+    return result
+
+
+scaled = scale(values, 2)
+print(scaled[0], scaled[1], scaled[-1])
+
+squares: List[int] = [x * x for x in range(4)]
+print(len(squares), squares[3])
+
+plain.append(2)
+print(len(plain))
+counts.clear()
+print(len(counts), bool(counts))
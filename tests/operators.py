@@ -0,0 +1,12 @@
+a = 7
+b = -2
+
+print(a % 3, b % 3, -a % 3, a % -3)
+print(a ** 2, b ** 2, (-a) ** 2, -a ** 2, 2 ** -1)
+print(a // 2, b // 3)
+
+x = 10
+x //= 3
+x **= 2
+x %= 5
+print(x)
@@ -0,0 +1,28 @@
+ages = {"john": 42, "anna": 31, 7: "seven"}
+ages["bob"] = 25
+for name in ages:
+    print(name, ages[name])
+
+del ages["anna"]
+ages["anna"] = 32
+for name, age in ages.items():
+    print(name, age)
+
+for age in ages.values():
+    print(age)
+
+name, age = ages.popitem()
+print(name, age, len(ages))
+print(ages.pop("john"), len(ages))
+
+squares = {}
+for i in range(100):
+    squares[i] = i * i
+for i in range(95):
+    del squares[i]
+for key in squares.keys():
+    print(key, squares[key])
+
+key = "dynamic"
+print({key: 1}["dynamic"])
+print(len({}), len(squares))
@@ -0,0 +1,22 @@
+a = {1, 2, 3}
+b = {3, 4}
+
+union = a | b
+print(len(union), 1 in union, 4 in union)
+
+intersection = a & b
+print(len(intersection), 3 in intersection, 1 in intersection)
+
+symmetric = a ^ b
+print(len(symmetric), 1 in symmetric, 3 in symmetric, 4 in symmetric)
+
+a |= {7}
+a &= {1, 7, 9}
+a ^= {1, 5}
+print(len(a), 1 in a, 5 in a, 7 in a)
+
+x = 12
+y = 10
+print(x | y, x & y, x ^ y)
+x ^= y
+print(x, x | 1, 6 & y)
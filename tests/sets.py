@@ -0,0 +1,41 @@
+a = {1, 2, 3, 3}
+b = set([3, 4, 5])
+c = {x * x for x in range(6) if x % 2 == 0}
+
+print(len(a), len(b), len(c))
+print(2 in a, 4 in a, 4 not in a)
+print(16 in c, 9 in c)
+
+a.add(4)
+a.add(1)
+a.discard(10)
+a.remove(2)
+print(len(a), 2 in a, 4 in a)
+
+union = a.union(b)
+print(len(union), 5 in union)
+
+intersection = a.intersection(b)
+print(len(intersection), 3 in intersection, 1 in intersection)
+
+difference = a - b
+print(len(difference), 1 in difference, 3 in difference)
+
+symmetric = a.symmetric_difference(b)
+print(len(symmetric), 1 in symmetric, 3 in symmetric, 5 in symmetric)
+
+print(set([1]).issubset(a), a.issuperset([1, 3]), a.isdisjoint([7, 8]))
+print(set([1, 3]) <= a, set([1, 3]) < a, a < a, a == set([1, 3, 4]))
+
+total = 0
+for element in a:
+    total += element
+print(total)
+
+d = {"name": "John", "age": 42}
+print("name" in d, "surname" in d)
+
+empty = set()
+print(len(empty), bool(empty), bool(a))
+a.clear()
+print(len(a))
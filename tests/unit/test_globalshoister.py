@@ -0,0 +1,54 @@
+"""Tests of the hoisted globals"""
+import io
+import unittest
+
+from pythonlua.globalshoister import GlobalsHoister
+from pythonlua.translator import Translator
+
+
+SOURCE = "x = [len(str(i)) for i in range(10)]\nprint(math.floor(len(x) / 2))\n"
+
+
+class RecordingStream(io.StringIO):
+    """Text stream remembering every write"""
+    def __init__(self):
+        super().__init__()
+        self.writes = []
+
+    def write(self, text):
+        self.writes.append(text)
+        return super().write(text)
+
+
+class GlobalsHoisterTest(unittest.TestCase):
+    """Aliases of the globals used by the translated code"""
+    def test_header_is_written_first(self):
+        """The aliases of the emitted globals are declared on the first line"""
+        stream = RecordingStream()
+        Translator().translate_to_stream(SOURCE, stream)
+
+        self.assertEqual(stream.writes[0],
+                         "local len, list_of, math_floor, print, str = "
+                         "len, list_of, math.floor, print, str\n")
+        self.assertEqual(stream.getvalue(), Translator().translate(SOURCE))
+
+    def test_unused_operators_are_not_hoisted(self):
+        """Only the formats written by the visitor declare aliases"""
+        lua_code = Translator().translate("x = 1\nprint(x ^ 2)\n")
+
+        header = lua_code.partition("\n")[0]
+        self.assertEqual(header, "local bit32_bxor, print = bit32.bxor, print")
+
+    def test_aliases_are_limited(self):
+        """Globals above the limit are read from the global table"""
+        names = ["math.f{}".format(i) for i in range(GlobalsHoister.MAX_ALIASES + 1)]
+        source = "".join("{}()\n".format(name) for name in names)
+        lua_code = Translator().translate(source)
+
+        header, _, body = lua_code.partition("\n")
+        self.assertEqual(header.count("math."), GlobalsHoister.MAX_ALIASES)
+        self.assertIn("\n{}()".format(names[-1]), "\n" + body)
+
+
+if __name__ == "__main__":
+    unittest.main()
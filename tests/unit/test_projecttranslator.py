@@ -0,0 +1,84 @@
+"""Tests of the project mode"""
+import os
+import shutil
+import tempfile
+import unittest
+
+from pythonlua.config import Config
+from pythonlua.projecttranslator import ProjectTranslator
+
+
+class ProjectTranslatorTest(unittest.TestCase):
+    """Outputs of the translated projects"""
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.source_dir = os.path.join(self.directory, "src")
+        self.output_dir = os.path.join(self.directory, "out")
+        os.makedirs(self.source_dir)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write_source(self, name, content):
+        """Write the python file of the project"""
+        with open(os.path.join(self.source_dir, name), "w") as file:
+            file.write(content)
+
+    def translate(self, config=None):
+        """Translate the project, return the number of failures and the report"""
+        report = []
+        project = ProjectTranslator(config if config is not None else Config(),
+                                    self.output_dir, jobs=1)
+        failed = project.translate(self.source_dir, report=report.append)
+        return failed, report
+
+    def test_failed_translation_is_retried(self):
+        """A failed file leaves no output and is translated again"""
+        self.write_source("good.py", "print(1)\n")
+        self.write_source("bad.py", "def broken(:\n")
+
+        failed, _ = self.translate()
+        self.assertEqual(failed, 1)
+        self.assertTrue(os.path.isfile(os.path.join(self.output_dir, "good.lua")))
+        self.assertFalse(os.path.exists(os.path.join(self.output_dir, "bad.lua")))
+        self.assertEqual(sorted(os.listdir(self.output_dir)),
+                         [ProjectTranslator.STAMP_FILENAME, "good.lua", "luainit.lua"])
+
+        failed, report = self.translate()
+        self.assertEqual(failed, 1)
+        bad = os.path.join(self.source_dir, "bad.py")
+        self.assertTrue(any(line.startswith(bad + ": FAILED") for line in report))
+        self.assertIn("{}: up to date".format(os.path.join(self.source_dir, "good.py")),
+                      report)
+
+
+    def test_changed_options_retranslate(self):
+        """Outputs of another config are translated again"""
+        self.write_source("shift.py", "x = 1\nprint(x << 4)\n")
+        output_filename = os.path.join(self.output_dir, "shift.lua")
+
+        self.translate()
+        with open(output_filename) as file:
+            self.assertIn("bit32.lshift", file.read())
+
+        config = Config()
+        config.data["target"] = "5.3"
+        failed, report = self.translate(config)
+        self.assertEqual(failed, 0)
+        self.assertFalse(any(line.endswith("up to date") for line in report))
+        with open(output_filename) as file:
+            self.assertIn("<<", file.read())
+
+        _, report = self.translate(config)
+        self.assertIn("{}: up to date".format(os.path.join(self.source_dir, "shift.py")),
+                      report)
+
+    def test_runtime_module_collision(self):
+        """A source file can not overwrite the runtime module"""
+        self.write_source("luainit.py", "print(1)\n")
+        with self.assertRaises(RuntimeError):
+            self.translate()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,79 @@
+"""Tests of the translation cache"""
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import pythonlua
+from pythonlua.config import Config
+from pythonlua.translationcache import TranslationCache
+from pythonlua.translator import Translator
+
+
+SOURCE = "x = [i * i for i in range(10)]\nprint(x)\n"
+
+
+class TranslationCacheTest(unittest.TestCase):
+    """Keys and hits of the translation cache"""
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_translation_is_cached(self):
+        """The second translation of the same source is a hit"""
+        cache = TranslationCache(os.path.join(self.directory, "cache"))
+        first = Translator(cache=cache).translate(SOURCE)
+        second = Translator(cache=cache).translate(SOURCE)
+
+        self.assertEqual(first, second)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def test_profiled_translation_is_cached(self):
+        """The profile visits the modules missing in the cache only"""
+        cache = TranslationCache(os.path.join(self.directory, "cache"))
+        with mock.patch("sys.stderr"):
+            first = Translator(cache=cache, profile=True)
+            first.translate(SOURCE)
+            second = Translator(cache=cache, profile=True)
+            second.translate(SOURCE)
+
+        self.assertIsNotNone(first.profile_stats)
+        self.assertIsNone(second.profile_stats)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def test_changed_fingerprint_misses(self):
+        """Entries of another translator build are not reused"""
+        cache = TranslationCache(os.path.join(self.directory, "cache"))
+        with mock.patch.object(TranslationCache, "_fingerprint", "old build"):
+            Translator(cache=cache).translate(SOURCE)
+        with mock.patch.object(TranslationCache, "_fingerprint", "new build"):
+            Translator(cache=cache).translate(SOURCE)
+
+        self.assertEqual((cache.hits, cache.misses), (0, 2))
+
+    def test_fingerprint_follows_the_sources(self):
+        """Editing a translator source or the runtime changes the fingerprint"""
+        package = os.path.dirname(os.path.abspath(pythonlua.__file__))
+        sources = os.path.join(self.directory, "pythonlua")
+        shutil.copytree(package, sources, ignore=shutil.ignore_patterns("__pycache__"))
+
+        original = TranslationCache.make_fingerprint(sources)
+        self.assertEqual(original, TranslationCache.make_fingerprint(sources))
+
+        for name in ("nodevisitor.py", "luainit.lua"):
+            with open(os.path.join(sources, name), "a") as file:
+                file.write("\n")
+            changed = TranslationCache.make_fingerprint(sources)
+            self.assertNotEqual(original, changed)
+            original = changed
+
+        config = Config()
+        self.assertNotEqual(TranslationCache.make_key(SOURCE, config, "a"),
+                            TranslationCache.make_key(SOURCE, config, "b"))
+
+
+if __name__ == "__main__":
+    unittest.main()